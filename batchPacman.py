@@ -0,0 +1,358 @@
+# batchPacman.py
+# --------------
+# Many games of classic Pacman stepped at once with NumPy.
+
+"""
+A batch environment for simulating many games of Pacman at once, e.g. to
+tune evaluation weights over millions of steps.
+
+BatchGameState holds N games on one layout as struct-of-arrays and moves one
+agent in every game with a handful of array operations, following the rules
+in pacman.py (PacmanRules, GhostRules) exactly.  Actions are indices into
+DIRECTIONS rather than direction strings.
+
+    batch = BatchGameState([initialState] * 1000)
+    rng = numpy.random.default_rng(0)
+    while not batch.isOver().all():
+        for agentIndex in range(batch.numAgents):
+            batch.step(agentIndex, batch.sampleLegalActions(agentIndex, rng))
+
+To check the batch rules against GameState.generateSuccessor, run
+
+    python batchPacman.py -l mediumClassic -n 100
+
+which plays random games both ways and compares them after every move.
+
+NumPy is only needed by this module; the rest of the project runs without it.
+"""
+
+from game import Directions
+from game import Actions
+from game import BitGrid
+from game import Configuration
+from pacman import GameState
+from pacman import SCARED_TIME
+from pacman import COLLISION_TOLERANCE
+from pacman import TIME_PENALTY
+import sys
+
+try:
+    import numpy
+    _NUMPY_ENABLED = True
+except ImportError:
+    _NUMPY_ENABLED = False
+
+# Action i of a batch is the direction DIRECTIONS[i]
+DIRECTIONS = [Directions.NORTH, Directions.SOUTH,
+              Directions.EAST, Directions.WEST, Directions.STOP]
+STOP = DIRECTIONS.index(Directions.STOP)
+_DIRECTION_INDEX = dict([(d, i) for i, d in enumerate(DIRECTIONS)])
+_REVERSE = [_DIRECTION_INDEX[Actions.reverseDirection(d)] for d in DIRECTIONS]
+
+# Positions are doubled so that the half steps of scared ghosts stay integers
+PACMAN_STEP = 2
+GHOST_STEP = 2
+SCARED_GHOST_STEP = 1
+
+
+class BatchGameState:
+    """
+    N games of Pacman on the same layout, held as struct-of-arrays:
+
+      positions     int  [N, numAgents, 2]   doubled (x, y) of each agent
+      directions    int  [N, numAgents]      index into DIRECTIONS
+      scaredTimers  int  [N, numAgents]
+      food          bool [N, width, height]
+      capsules      bool [N, width, height]
+      numFood       int  [N]
+      scores        int  [N]
+      win, lose     bool [N]
+
+    Every game moves the same agent at a time, as the Game loop does.  Games
+    that are over are left untouched by step().
+    """
+
+    def __init__(self, gameStates):
+        """
+        Builds a batch holding a copy of each GameState, which must all be on
+        the same layout and have the same number of agents.
+        """
+        if not _NUMPY_ENABLED:
+            raise Exception('The batch environment needs NumPy, which is not installed')
+        if len(gameStates) == 0:
+            raise Exception('A batch needs at least one game')
+
+        self.layout = gameStates[0].data.layout
+        self.numGames = len(gameStates)
+        self.numAgents = gameStates[0].getNumAgents()
+        width, height = self.layout.width, self.layout.height
+
+        self.positions = numpy.zeros((self.numGames, self.numAgents, 2), dtype=numpy.int64)
+        self.directions = numpy.zeros((self.numGames, self.numAgents), dtype=numpy.int64)
+        self.scaredTimers = numpy.zeros((self.numGames, self.numAgents), dtype=numpy.int64)
+        self.startPositions = numpy.zeros((self.numGames, self.numAgents, 2), dtype=numpy.int64)
+        self.startDirections = numpy.zeros((self.numGames, self.numAgents), dtype=numpy.int64)
+        self.food = numpy.zeros((self.numGames, width, height), dtype=bool)
+        self.capsules = numpy.zeros((self.numGames, width, height), dtype=bool)
+        self.scores = numpy.zeros(self.numGames, dtype=numpy.int64)
+        self.win = numpy.zeros(self.numGames, dtype=bool)
+        self.lose = numpy.zeros(self.numGames, dtype=bool)
+
+        for i, state in enumerate(gameStates):
+            if state.data.layout is not self.layout or state.getNumAgents() != self.numAgents:
+                raise Exception('All the games of a batch must share a layout and agents')
+            for agentIndex, agentState in enumerate(state.data.agentStates):
+                self.positions[i, agentIndex] = _doubled(agentState.configuration.pos)
+                self.directions[i, agentIndex] = _DIRECTION_INDEX[agentState.configuration.direction]
+                self.scaredTimers[i, agentIndex] = agentState.scaredTimer
+                self.startPositions[i, agentIndex] = _doubled(agentState.start.pos)
+                self.startDirections[i, agentIndex] = _DIRECTION_INDEX[agentState.start.direction]
+            for x, y in state.getFood().asList():
+                self.food[i, x, y] = True
+            for x, y in state.getCapsules():
+                self.capsules[i, x, y] = True
+            self.scores[i] = state.data.score
+            self.win[i] = state.isWin()
+            self.lose[i] = state.isLose()
+        self.numFood = self.food.sum(axis=(1, 2))
+
+        self.openMoves = _openMoves(self.layout.walls)
+
+    def isOver(self):
+        return self.win | self.lose
+
+    def getLegalActionMask(self, agentIndex=0):
+        """
+        Returns a bool array [N, len(DIRECTIONS)] marking the legal actions of
+        the agent in each game, the same actions GameState.getLegalActions
+        gives.  Games that are over have none.
+        """
+        positions = self.positions[:, agentIndex]
+        onGrid = (positions % 2 == 0).all(axis=1)
+        cells = positions // 2
+        mask = numpy.zeros((self.numGames, len(DIRECTIONS)), dtype=bool)
+        mask[:, :STOP] = self.openMoves[cells[:, 0], cells[:, 1]]
+        if agentIndex == 0:
+            mask[:, STOP] = True
+        else:
+            # Ghosts cannot turn around unless they reach a dead end
+            games = numpy.nonzero(mask.sum(axis=1) > 1)[0]
+            mask[games, numpy.take(_REVERSE, self.directions[games, agentIndex])] = False
+            mask[:, STOP] = False
+
+        # In between grid points, all agents must continue straight
+        between = numpy.nonzero(~onGrid)[0]
+        mask[between] = False
+        mask[between, self.directions[between, agentIndex]] = True
+
+        mask[self.isOver()] = False
+        return mask
+
+    def sampleLegalActions(self, agentIndex, randomState):
+        """
+        Returns an action for every game drawn uniformly from the agent's
+        legal actions (STOP in games that are over), using a NumPy Generator.
+        """
+        mask = self.getLegalActionMask(agentIndex)
+        weights = randomState.random(mask.shape)
+        weights[~mask] = -1
+        actions = weights.argmax(axis=1)
+        actions[~mask.any(axis=1)] = STOP
+        return actions
+
+    def step(self, agentIndex, actions):
+        """
+        Makes the agent take actions[i] in game i, for every game that is not
+        over, with the same effects as GameState.generateSuccessor.
+        """
+        actions = numpy.asarray(actions, dtype=numpy.int64)
+        games = numpy.nonzero(~self.isOver())[0]
+        actions = actions[games]
+        if not self.getLegalActionMask(agentIndex)[games, actions].all():
+            raise Exception('Illegal action in a batch for agent ' + str(agentIndex))
+
+        scoreChange = numpy.zeros(len(games), dtype=numpy.int64)
+        if agentIndex == 0:
+            self._movePacman(games, actions, scoreChange)
+            scoreChange -= TIME_PENALTY  # Penalty for waiting around
+            for ghostIndex in range(1, self.numAgents):
+                self._checkDeath(games, ghostIndex, scoreChange)
+        else:
+            self._moveGhost(games, agentIndex, actions)
+            self._decrementTimer(games, agentIndex)
+            self._checkDeath(games, agentIndex, scoreChange)
+        self.scores[games] += scoreChange
+
+    def _movePacman(self, games, actions, scoreChange):
+        self.positions[games, 0] += PACMAN_STEP * _VECTORS[actions]
+        moving = actions != STOP  # There is no stop direction
+        self.directions[games[moving], 0] = actions[moving]
+
+        # Eat food; Pacman is always on a grid point
+        x, y = (self.positions[games, 0] // 2).T
+        ate = self.food[games, x, y]
+        self.food[games[ate], x[ate], y[ate]] = False
+        self.numFood[games] -= ate
+        scoreChange += 10 * ate
+        won = ate & (self.numFood[games] == 0)
+        scoreChange += 500 * won
+        self.win[games] |= won
+
+        # Eat capsules, which scare every ghost
+        ate = self.capsules[games, x, y]
+        self.capsules[games[ate], x[ate], y[ate]] = False
+        self.scaredTimers[games[ate], 1:] = SCARED_TIME
+
+    def _moveGhost(self, games, ghostIndex, actions):
+        scared = self.scaredTimers[games, ghostIndex] > 0
+        step = numpy.where(scared, SCARED_GHOST_STEP, GHOST_STEP)
+        self.positions[games, ghostIndex] += step[:, None] * _VECTORS[actions]
+        self.directions[games, ghostIndex] = actions
+
+    def _decrementTimer(self, games, ghostIndex):
+        timers = self.scaredTimers[games, ghostIndex]
+        # Snap back onto the grid now that full speed resumes
+        snap = games[timers == 1]
+        self.positions[snap, ghostIndex] = (self.positions[snap, ghostIndex] + 1) // 2 * 2
+        self.scaredTimers[games, ghostIndex] = numpy.maximum(0, timers - 1)
+
+    def _checkDeath(self, games, ghostIndex, scoreChange):
+        distance = abs(self.positions[games, ghostIndex] - self.positions[games, 0]).sum(axis=1)
+        collide = distance <= 2 * COLLISION_TOLERANCE
+        scared = self.scaredTimers[games, ghostIndex] > 0
+
+        # Pacman eats the ghost, which goes back to its start
+        eaten = collide & scared
+        scoreChange += 200 * eaten
+        self.positions[games[eaten], ghostIndex] = self.startPositions[games[eaten], ghostIndex]
+        self.directions[games[eaten], ghostIndex] = self.startDirections[games[eaten], ghostIndex]
+        self.scaredTimers[games[eaten], ghostIndex] = 0
+
+        # The ghost catches Pacman, unless he has just won
+        killed = collide & ~scared & ~self.win[games]
+        scoreChange -= 500 * killed
+        self.lose[games] |= killed
+
+    def getGameState(self, index, template):
+        """
+        Returns game `index` as a GameState.  Its layout and each agent's
+        start come from `template`, which should be the state the game began
+        from.
+        """
+        state = template.deepCopy()
+        data = state.data
+        for agentIndex in range(self.numAgents):
+            x, y = self.positions[index, agentIndex]
+            data.moveAgent(agentIndex, Configuration(
+                (int(x) / 2.0, int(y) / 2.0), DIRECTIONS[self.directions[index, agentIndex]]))
+            data.setScaredTimer(agentIndex, int(self.scaredTimers[index, agentIndex]))
+        food = BitGrid(self.layout.width, self.layout.height)
+        for x, y in zip(*numpy.nonzero(self.food[index])):
+            food[int(x)][int(y)] = True
+        data.food = food
+        data.capsules = [(x, y) for x, y in template.getCapsules() if self.capsules[index, x, y]]
+        data.score = int(self.scores[index])
+        data._win = bool(self.win[index])
+        data._lose = bool(self.lose[index])
+        data._hash = data.computeHash()
+        return state
+
+
+def _doubled(pos):
+    x, y = pos
+    return int(round(2 * x)), int(round(2 * y))
+
+
+def _openMoves(walls):
+    """
+    Returns a bool array [width, height, STOP] marking, for every cell, the
+    directions Actions.getPossibleActions allows from it.
+    """
+    openMoves = numpy.zeros((walls.width, walls.height, STOP), dtype=bool)
+    for x in range(walls.width):
+        for y in range(walls.height):
+            for i in range(STOP):
+                dx, dy = Actions.directionToVector(DIRECTIONS[i])
+                try:
+                    openMoves[x, y, i] = not walls[x + int(dx)][y + int(dy)]
+                except IndexError:
+                    pass  # Off the board
+    return openMoves
+
+
+if _NUMPY_ENABLED:
+    _VECTORS = numpy.array([Actions.directionToVector(d) for d in DIRECTIONS], dtype=numpy.int64)
+
+###############
+# Conformance #
+###############
+
+
+def checkConformance(layout, numGames=100, maxMoves=1000, numGhosts=4, seed=0):
+    """
+    Plays numGames random games on the layout both with GameState and with
+    a BatchGameState, making the same moves, and checks that the legal
+    actions and resulting states agree after every move.  Returns the number
+    of moves checked and raises an Exception on the first disagreement.
+    """
+    import random
+    rand = random.Random(seed)
+    initialState = GameState()
+    initialState.initialize(layout, numGhosts)
+    states = [initialState] * numGames
+    batch = BatchGameState(states)
+    checked = 0
+    for move in range(maxMoves):
+        agentIndex = move % batch.numAgents
+        mask = batch.getLegalActionMask(agentIndex)
+        actions = numpy.full(numGames, STOP, dtype=numpy.int64)
+        for i, state in enumerate(states):
+            legal = state.getLegalActions(agentIndex)
+            if set(legal) != set([DIRECTIONS[a] for a in numpy.nonzero(mask[i])[0]]):
+                raise Exception('Game %d, move %d: legal actions %s differ from the batch'
+                                % (i, move, legal))
+            if legal:
+                action = rand.choice(legal)
+                actions[i] = _DIRECTION_INDEX[action]
+                states[i] = state.generateSuccessor(agentIndex, action)
+        batch.step(agentIndex, actions)
+        for i, state in enumerate(states):
+            batchState = batch.getGameState(i, initialState)
+            if not (batchState == state and batchState.isWin() == state.isWin()
+                    and batchState.isLose() == state.isLose()):
+                raise Exception('Game %d, move %d: the batch reached\n%s\nbut GameState reached\n%s'
+                                % (i, move, batchState, state))
+        checked += len([s for s in states if not (s.isWin() or s.isLose())])
+        if batch.isOver().all():
+            break
+    return checked
+
+
+def readCommand(argv):
+    from optparse import OptionParser
+    import layout
+    parser = OptionParser('USAGE: python batchPacman.py <options>')
+    parser.add_option('-l', '--layout', dest='layout', default='mediumClassic',
+                      help='the layout to play on [Default: %default]')
+    parser.add_option('-n', '--numGames', dest='numGames', type='int', default=100,
+                      help='the number of games to compare [Default: %default]')
+    parser.add_option('-m', '--maxMoves', dest='maxMoves', type='int', default=1000,
+                      help='the most moves to play in each game [Default: %default]')
+    parser.add_option('-k', '--numghosts', dest='numGhosts', type='int', default=4,
+                      help='the maximum number of ghosts [Default: %default]')
+    parser.add_option('-s', '--seed', dest='seed', type='int', default=0,
+                      help='the seed for the random moves [Default: %default]')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    options.layout = layout.getLayout(options.layout)
+    if options.layout == None:
+        raise Exception('The layout cannot be found')
+    return options
+
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    checked = checkConformance(options.layout, options.numGames, options.maxMoves,
+                               options.numGhosts, options.seed)
+    print('The batch environment agrees with GameState on %d moves' % checked)
@@ -0,0 +1,5 @@
+# benchmarks
+# ----------
+# Performance measurements for the Pacman search framework.  Run them from the
+# project directory: 'python -m benchmarks' runs the whole suite and compares
+# it with a baseline, 'python -m benchmarks.memory' (or .micro, .macro) one part.
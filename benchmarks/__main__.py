@@ -0,0 +1,129 @@
+# __main__.py
+# -----------
+# Runs the benchmark suite: python -m benchmarks
+
+"""
+Runs the benchmark suite, saves the results and compares them with a
+baseline.
+
+  python -m benchmarks --output baseline.json
+  python -m benchmarks --baseline baseline.json --threshold 0.1
+
+Timings only compare on the same machine, so keep a baseline per machine.
+
+The suite is made of the microbenchmarks of benchmarks.micro, the agent
+macrobenchmarks of benchmarks.macro and the node memory measurement of
+benchmarks.memory; --micro, --macro and --memory pick some of them.  Every
+result has a 'value' where lower is better.  Against a baseline, a value
+more than `threshold` (a fraction) above the baseline's is a regression,
+and the suite then exits with status 1.  A macrobenchmark that expands a
+different number of states is reported too, since its games differ.
+"""
+
+import json
+import platform
+import sys
+import time
+
+from benchmarks import macro, memory, micro
+
+
+def runSuite(groups, options):
+    results = {}
+    if 'micro' in groups:
+        print('Microbenchmarks (%s):' % options.layout)
+        results.update(micro.run(options.layout, options.numGhosts, options.repeat, verbose=True))
+    if 'macro' in groups:
+        print('Macrobenchmarks:')
+        results.update(macro.run(verbose=True, **macro.caseOptions(options)))
+    if 'memory' in groups:
+        result = memory.measure(options.layout, 9, options.numGhosts)
+        print('Memory: %(bytesPerNode).0f bytes per node' % result)
+        results['memory/%s/bytesPerNode' % options.layout] = {'value': result['bytesPerNode'],
+                                                              'unit': 'bytes/node', 'nodes': result['nodes']}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints how the results differ from the baseline's and returns the names
+    of the benchmarks that regressed by more than `threshold`.
+    """
+    regressions = []
+    print('Compared with the baseline (threshold %.0f%%):' % (100 * threshold))
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        old, new = baseline[name]['value'], results[name]['value']
+        change = (new - old) / old if old else 0.0
+        notes = []
+        if change > threshold:
+            notes.append('REGRESSION')
+            regressions.append(name)
+        elif change < -threshold:
+            notes.append('faster')
+        if baseline[name].get('expanded') != results[name].get('expanded'):
+            notes.append('expanded %s -> %s' % (baseline[name].get('expanded'), results[name].get('expanded')))
+        if notes:
+            print('  %-56s %10.3f -> %10.3f %s %+6.1f%% %s' % (name, old, new, results[name]['unit'],
+                                                             100 * change, ', '.join(notes)))
+    missing = sorted(set(baseline) - set(results))
+    print('  %d compared, %d regressions, %d in the baseline not run' %
+          (len(set(results) & set(baseline)), len(regressions), len(missing)))
+    return regressions
+
+
+def readCommand(argv):
+    from optparse import OptionParser
+    parser = OptionParser('USAGE: python -m benchmarks <options>')
+    parser.add_option('--micro', action='store_true', dest='micro', default=False,
+                      help='run the microbenchmarks (all groups run when none is chosen)')
+    parser.add_option('--macro', action='store_true', dest='macro', default=False,
+                      help='run the agent macrobenchmarks')
+    parser.add_option('--memory', action='store_true', dest='memory', default=False,
+                      help='measure the memory per search node')
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help='write the results to this JSON file')
+    parser.add_option('-b', '--baseline', dest='baseline', default=None,
+                      help='compare the results with this JSON file of earlier results')
+    parser.add_option('-t', '--threshold', dest='threshold', type='float', default=0.1,
+                      help='slowdown, as a fraction, counted as a regression [Default: %default]')
+    parser.add_option('-l', '--layout', dest='layout', default='mediumClassic',
+                      help='the layout of the micro and memory benchmarks [Default: %default]')
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=5,
+                      help='measurements per microbenchmark, of which the fastest counts [Default: %default]')
+    macro.addOptions(parser)
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+
+def main(argv):
+    options = readCommand(argv)
+    groups = [group for group in ('micro', 'macro', 'memory') if getattr(options, group)]
+    results = runSuite(groups or ['micro', 'macro', 'memory'], options)
+
+    if options.output:
+        report = {'python': platform.python_version(), 'platform': platform.platform(),
+                  'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results}
+        f = open(options.output, 'w')
+        try:
+            json.dump(report, f, indent=1, sort_keys=True)
+        finally:
+            f.close()
+        print('Wrote ' + options.output)
+
+    if options.baseline:
+        f = open(options.baseline)
+        try:
+            baseline = json.load(f)['results']
+        finally:
+            f.close()
+        if compare(results, baseline, options.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
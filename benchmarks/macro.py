@@ -0,0 +1,129 @@
+# macro.py
+# --------
+# Times the search agents on the opening moves of fixed-seed games.
+
+"""
+Macrobenchmarks of the search agents.
+
+  python -m benchmarks.macro --agents AlphaBetaAgent --depths 2,3 --layouts smallClassic
+
+Each case plays the opening moves of a game with one agent at one depth on
+one layout, against RandomGhosts seeded from the case's name, and reports
+the milliseconds per Pacman move and the states the searches expanded.  The
+games, and so the expanded counts, are the same on every run; a change in
+the count means the search itself changed, not just its speed.
+
+By default every combination of MinimaxAgent, AlphaBetaAgent and
+ExpectimaxAgent, depths 2 to 4 and the layouts in layouts/ is played; the
+options narrow the matrix when iterating on one agent.
+"""
+
+import os
+import random
+import sys
+import time
+
+import layout
+import multiAgents
+from ghostAgents import RandomGhost
+from pacman import GameState
+
+AGENTS = ['MinimaxAgent', 'AlphaBetaAgent', 'ExpectimaxAgent']
+DEPTHS = [2, 3, 4]
+
+
+def allLayouts():
+    """
+    The names of the layouts in the layouts/ directory.
+    """
+    directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'layouts')
+    return sorted(name[:-4] for name in os.listdir(directory) if name.endswith('.lay'))
+
+
+def playCase(agentName, depth, layoutName, moves, numGhosts):
+    """
+    Plays up to `moves` Pacman moves and returns the seconds spent in the
+    agent's getAction, the states expanded and the moves played.
+    """
+    layoutObject = layout.getLayout(layoutName)
+    if layoutObject == None:
+        raise Exception("The layout " + layoutName + " cannot be found")
+    random.seed('%s/%d/%s' % (agentName, depth, layoutName))
+    agent = getattr(multiAgents, agentName)(depth=str(depth))
+    ghosts = [RandomGhost(i + 1) for i in range(numGhosts)]
+    state = GameState()
+    state.initialize(layoutObject, numGhosts)
+    agent.registerInitialState(state.deepCopy())
+
+    seconds, expanded, played = 0.0, 0, 0
+    while played < moves and not (state.isWin() or state.isLose()):
+        with GameState.trackExplored('count') as explored:
+            start = time.perf_counter()
+            action = agent.getAction(state.deepCopy())
+            seconds += time.perf_counter() - start
+        expanded += len(explored)
+        played += 1
+        state = state.generateSuccessor(0, action)
+        for ghost in ghosts[:state.getNumAgents() - 1]:
+            if state.isWin() or state.isLose():
+                break
+            state = state.generateSuccessor(ghost.index, ghost.getAction(state))
+    if hasattr(agent, 'final'):
+        agent.final(state)
+    return seconds, expanded, played
+
+
+def run(agents=AGENTS, depths=DEPTHS, layouts=None, moves=3, numGhosts=2, verbose=False):
+    """
+    Returns {benchmark name: result}, where each result holds the
+    milliseconds per move as 'value' and the states expanded per move.
+    """
+    results = {}
+    for layoutName in layouts or allLayouts():
+        for agentName in agents:
+            for depth in depths:
+                seconds, expanded, played = playCase(agentName, depth, layoutName, moves, numGhosts)
+                name = 'macro/%s/%s/depth%d' % (layoutName, agentName, depth)
+                results[name] = {'value': 1000.0 * seconds / played, 'unit': 'ms/move',
+                                 'expanded': expanded, 'moves': played}
+                if verbose:
+                    print('  %-48s %10.1f ms/move %10d expanded' % (name[6:], 1000.0 * seconds / played, expanded))
+    return results
+
+
+def addOptions(parser):
+    parser.add_option('--agents', dest='agents', default=','.join(AGENTS),
+                      help='comma separated search agents [Default: %default]')
+    parser.add_option('--depths', dest='depths', default=','.join(map(str, DEPTHS)),
+                      help='comma separated search depths [Default: %default]')
+    parser.add_option('--layouts', dest='layouts', default=None,
+                      help='comma separated layouts [Default: every layout in layouts/]')
+    parser.add_option('-m', '--moves', dest='moves', type='int', default=3,
+                      help='Pacman moves played per case [Default: %default]')
+    parser.add_option('-k', '--numghosts', dest='numGhosts', type='int', default=2,
+                      help='the maximum number of ghosts [Default: %default]')
+
+
+def caseOptions(options):
+    """
+    The keyword arguments of run() given by the command line options.
+    """
+    return {'agents': options.agents.split(','),
+            'depths': [int(depth) for depth in options.depths.split(',')],
+            'layouts': options.layouts.split(',') if options.layouts else None,
+            'moves': options.moves, 'numGhosts': options.numGhosts}
+
+
+def readCommand(argv):
+    from optparse import OptionParser
+    parser = OptionParser('USAGE: python -m benchmarks.macro <options>')
+    addOptions(parser)
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    run(verbose=True, **caseOptions(options))
@@ -0,0 +1,88 @@
+# memory.py
+# ---------
+# Measures how much memory a search tree of GameStates takes.
+
+"""
+Reports the memory cost of a search node, in bytes.
+
+  python -m benchmarks.memory --layout mediumClassic --depth 9
+
+A game tree is expanded breadth first with generateSuccessor to the given
+number of plies, and every state is kept alive, as a search holding its nodes
+would.  tracemalloc measures what the states cost on top of the layout and of
+anything the framework caches, which a first, untraced expansion warms up.
+"""
+
+import sys
+import tracemalloc
+
+import layout
+from pacman import GameState
+
+
+def expandTree(state, plies):
+    """
+    Returns every state within the given number of plies of state, with
+    the agents moving in turn.
+    """
+    numAgents = state.getNumAgents()
+    nodes = [state]
+    frontier = [state]
+    for ply in range(plies):
+        agentIndex = ply % numAgents
+        successors = []
+        for parent in frontier:
+            for action in parent.getLegalActions(agentIndex):
+                successors.append(parent.generateSuccessor(agentIndex, action))
+        nodes.extend(successors)
+        frontier = [s for s in successors if not (s.isWin() or s.isLose())]
+    return nodes
+
+
+def measure(layoutName='mediumClassic', plies=9, numGhosts=2):
+    """
+    Returns a dict with the number of nodes in the tree and the bytes they
+    take, in total and per node, both retained and at the peak.
+    """
+    layoutObject = layout.getLayout(layoutName)
+    if layoutObject == None:
+        raise Exception("The layout " + layoutName + " cannot be found")
+    root = GameState()
+    root.initialize(layoutObject, numGhosts)
+    expandTree(root, plies)  # warm up the caches
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        nodes = expandTree(root, plies)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    retained = current - before
+    return {'layout': layoutName, 'plies': plies, 'numGhosts': numGhosts,
+            'nodes': len(nodes), 'bytes': retained,
+            'bytesPerNode': float(retained) / len(nodes),
+            'peakBytesPerNode': float(peak - before) / len(nodes)}
+
+
+def readCommand(argv):
+    from optparse import OptionParser
+    parser = OptionParser('USAGE: python -m benchmarks.memory <options>')
+    parser.add_option('-l', '--layout', dest='layout', default='mediumClassic',
+                      help='the layout to search [Default: %default]')
+    parser.add_option('-d', '--depth', dest='plies', type='int', default=9,
+                      help='the number of plies to expand [Default: %default]')
+    parser.add_option('-k', '--numghosts', dest='numGhosts', type='int', default=2,
+                      help='the maximum number of ghosts [Default: %default]')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    result = measure(options.layout, options.plies, options.numGhosts)
+    print('%(layout)s, %(plies)d plies, %(numGhosts)d ghosts: %(nodes)d nodes' % result)
+    print('  %(bytesPerNode).0f bytes per node retained, %(peakBytesPerNode).0f at peak' % result)
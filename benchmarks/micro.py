@@ -0,0 +1,113 @@
+# micro.py
+# --------
+# Times the game engine's hot operations one at a time.
+
+"""
+Microbenchmarks of the operations every search spends its time in.
+
+  python -m benchmarks.micro --layout mediumClassic
+
+Each benchmark times one operation on a state a few moves into a game with
+timeit, repeating the measurement and keeping the fastest, and reports
+microseconds per operation.  The state is reached from a fixed seed, so the
+same operations are timed on every run.
+"""
+
+import itertools
+import random
+import sys
+import timeit
+
+import layout
+from pacman import GameState
+
+# Pacman and the ghosts each make this many random moves before timing starts
+WARMUP_MOVES = 10
+
+
+def startState(layoutName, numGhosts, seed='benchmarks'):
+    """
+    Returns the state reached from the layout's start by WARMUP_MOVES rounds
+    of seeded random moves (fewer if the game ends).
+    """
+    layoutObject = layout.getLayout(layoutName)
+    if layoutObject == None:
+        raise Exception("The layout " + layoutName + " cannot be found")
+    state = GameState()
+    state.initialize(layoutObject, numGhosts)
+    generator = random.Random(seed)
+    for move in range(WARMUP_MOVES):
+        for agentIndex in range(state.getNumAgents()):
+            successor = state.generateSuccessor(agentIndex, generator.choice(state.getLegalActions(agentIndex)))
+            if successor.isWin() or successor.isLose():
+                return state
+            state = successor
+    return state
+
+
+def operations(state):
+    """
+    Returns (name, function) pairs, each function doing one operation.
+    """
+    actions = [(agentIndex, action) for agentIndex in range(state.getNumAgents())
+               for action in state.getLegalActions(agentIndex)]
+    successors = itertools.cycle(actions)  # every agent's moves in turn
+    def generateSuccessor():
+        agentIndex, action = next(successors)
+        state.generateSuccessor(agentIndex, action)
+
+    data = state.data
+    equal = state.deepCopy().data  # equal but distinct, so __eq__ compares everything
+    walls = state.getWalls()
+    food = state.getFood()
+    foodGrid = type(food).__name__  # a BitGrid, unlike the walls
+    return [
+        ('GameState.generateSuccessor', generateSuccessor),
+        ('GameState.getLegalActions(pacman)', lambda: state.getLegalActions(0)),
+        ('GameState.getLegalActions(ghost)', lambda: state.getLegalActions(1)),
+        ('GameStateData.__hash__', lambda: hash(data)),
+        ('GameStateData.__eq__', lambda: data == equal),
+        ('Grid.copy', walls.copy),
+        ('Grid.asList', walls.asList),
+        ('Grid.packBits', walls.packBits),
+        ('%s.copy' % foodGrid, food.copy),
+        ('%s.asList' % foodGrid, food.asList),
+        ('%s.packBits' % foodGrid, food.packBits),
+    ]
+
+
+def run(layoutName='mediumClassic', numGhosts=2, repeat=5, verbose=False):
+    """
+    Returns {benchmark name: result}, where each result holds the time per
+    operation in microseconds as 'value'.
+    """
+    state = startState(layoutName, numGhosts)
+    results = {}
+    for name, function in operations(state):
+        timer = timeit.Timer(function)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat, number)) / number
+        results['micro/%s/%s' % (layoutName, name)] = {'value': best * 1e6, 'unit': 'us/op'}
+        if verbose:
+            print('  %-40s %10.3f us' % (name, best * 1e6))
+    return results
+
+
+def readCommand(argv):
+    from optparse import OptionParser
+    parser = OptionParser('USAGE: python -m benchmarks.micro <options>')
+    parser.add_option('-l', '--layout', dest='layout', default='mediumClassic',
+                      help='the layout to take the state from [Default: %default]')
+    parser.add_option('-k', '--numghosts', dest='numGhosts', type='int', default=2,
+                      help='the maximum number of ghosts [Default: %default]')
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=5,
+                      help='measurements per benchmark, of which the fastest counts [Default: %default]')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    run(options.layout, options.numGhosts, options.repeat, verbose=True)
@@ -23,6 +23,7 @@
 from util import *
 import time
 import os
+import random
 import traceback
 import sys
 
@@ -79,11 +80,26 @@ class Configuration:
 
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
-    """
 
-    def __init__(self, pos, direction):
-        self.pos = pos
-        self.direction = direction
+    Configurations are immutable.  Those at integer positions are interned, so
+    building one that already exists returns the existing instance.
+    """
+    __slots__ = ('pos', 'direction')
+
+    def __new__(cls, pos, direction):
+        key = (pos, direction, type(pos[0]), type(pos[1]))
+        configuration = _CONFIGURATIONS.get(key)
+        if configuration is None:
+            configuration = object.__new__(cls)
+            configuration.pos = pos
+            configuration.direction = direction
+            x, y = pos
+            if x == int(x) and y == int(y):
+                _CONFIGURATIONS[key] = configuration
+        return configuration
+
+    def __reduce__(self):
+        return (Configuration, (self.pos, self.direction))
 
     def getPosition(self):
         return (self.pos)
@@ -124,19 +140,26 @@ class Configuration:
         return Configuration((x + dx, y+dy), direction)
 
 
+# Interned Configurations, keyed by position, direction and the types of the
+# coordinates (so (1, 2) and (1.0, 2.0) stay distinct)
+_CONFIGURATIONS = {}
+
+
 class AgentState:
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer')
+
+    # state below potentially used for contest only, and never changed here
+    numCarrying = 0
+    numReturned = 0
 
     def __init__(self, startConfiguration, isPacman):
         self.start = startConfiguration
         self.configuration = startConfiguration
         self.isPacman = isPacman
         self.scaredTimer = 0
-        # state below potentially used for contest only
-        self.numCarrying = 0
-        self.numReturned = 0
 
     def __str__(self):
         if self.isPacman:
@@ -156,8 +179,6 @@ class AgentState:
         state = AgentState(self.start, self.isPacman)
         state.configuration = self.configuration
         state.scaredTimer = self.scaredTimer
-        state.numCarrying = self.numCarrying
-        state.numReturned = self.numReturned
         return state
 
     def getPosition(self):
@@ -262,7 +283,7 @@ class Grid:
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
-        x = index / self.height
+        x = index // self.height
         y = index % self.height
         return x, y
 
@@ -293,6 +314,156 @@ class Grid:
         return bools
 
 
+class BitGrid(Grid):
+    """
+    A Grid of booleans backed by the bits of a single int, with cell (x,y)
+    at bit x * height + y.  Ints are immutable, so copy() is O(1) and a write
+    replaces the int rather than touching other grids (copy-on-write).
+    count() is a popcount and asList() is cached, which suits the food grid
+    of a GameState: it is copied for every successor and only changes when
+    a pellet is eaten.
+
+    Data is accessed via grid[x][y] exactly as for Grid.
+    """
+
+    def __init__(self, width, height, initialValue=False, bitRepresentation=None):
+        if initialValue not in [False, True]:
+            raise Exception('Grids can only contain booleans')
+        self.CELLS_PER_INT = 30
+
+        self.width = width
+        self.height = height
+        self.bits = (1 << (width * height)) - 1 if initialValue else 0
+        self._count = None
+        self._list = None
+        if bitRepresentation:
+            self._unpackBits(bitRepresentation)
+
+    def fromGrid(grid):
+        """
+        Returns a BitGrid holding the same cells as any other Grid.
+        """
+        g = BitGrid(grid.width, grid.height)
+        bits = 0
+        for x, y in grid.asList():
+            bits |= 1 << (x * grid.height + y)
+        g.bits = bits
+        return g
+    fromGrid = staticmethod(fromGrid)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.width
+        if i < 0 or i >= self.width:
+            raise IndexError('grid column out of range')
+        return _BitGridColumn(self, i)
+
+    def __setitem__(self, key, item):
+        column = self[key]
+        for y in range(self.height):
+            column[y] = item[y]
+
+    def _get(self, x, y):
+        return (self.bits >> (x * self.height + y)) & 1 == 1
+
+    def _set(self, x, y, value):
+        bit = 1 << (x * self.height + y)
+        if value:
+            self.bits |= bit
+        else:
+            self.bits &= ~bit
+        self._count = None
+        self._list = None
+
+    def getData(self):
+        return [[self._get(x, y) for y in range(self.height)] for x in range(self.width)]
+    data = property(getData)
+
+    def __str__(self):
+        out = [[str(self._get(x, y))[0] for x in range(self.width)]
+               for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+    def __eq__(self, other):
+        if other == None:
+            return False
+        if isinstance(other, BitGrid):
+            return self.bits == other.bits and self.height == other.height
+        return self.data == other.data
+
+    def __hash__(self):
+        # Same bit order as Grid.__hash__, so equal grids hash alike
+        return hash(self.bits)
+
+    def copy(self):
+        g = BitGrid(self.width, self.height)
+        g.bits = self.bits
+        g._count = self._count
+        g._list = self._list
+        return g
+
+    def deepCopy(self):
+        return self.copy()
+
+    def shallowCopy(self):
+        return self.copy()
+
+    def count(self, item=True):
+        if self._count is None:
+            self._count = bin(self.bits).count('1')
+        if item:
+            return self._count
+        return self.width * self.height - self._count
+
+    def asList(self, key=True):
+        if not key:
+            return Grid.asList(self, key)
+        if self._list is None:
+            cells = []
+            bits = self.bits
+            while bits:
+                lowest = bits & -bits
+                cells.append(self._cellIndexToPosition(lowest.bit_length() - 1))
+                bits ^= lowest
+            self._list = cells
+        return self._list[:]
+
+
+class _BitGridColumn:
+    """
+    The grid[x] view of a BitGrid column, so that grid[x][y] reads and writes
+    the underlying bits.
+    """
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.x = x
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.grid.height
+        if y < 0 or y >= self.grid.height:
+            raise IndexError('grid row out of range')
+        return self.grid._get(self.x, y)
+
+    def __setitem__(self, y, value):
+        if y < 0:
+            y += self.grid.height
+        if y < 0 or y >= self.grid.height:
+            raise IndexError('grid row out of range')
+        self.grid._set(self.x, y, value)
+
+    def __len__(self):
+        return self.grid.height
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def count(self, item=True):
+        return list(self).count(item)
+
+
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1, 2)):
         return bitRep
@@ -393,7 +564,38 @@ class Actions:
     getSuccessor = staticmethod(getSuccessor)
 
 
+# Zobrist keys: one random 64 bit key per (feature, value) pair, e.g. per
+# agent configuration or per food cell.  A state's hash is the XOR of the keys
+# of everything it contains, so it can be updated in O(1) as the state changes.
+# Keys are derived from the feature itself so they agree between processes.
+_ZOBRIST_KEYS = {}
+
+
+def zobristKey(*feature):
+    key = _ZOBRIST_KEYS.get(feature)
+    if key is None:
+        key = random.Random(repr(feature)).getrandbits(64)
+        _ZOBRIST_KEYS[feature] = key
+    return key
+
+
+def _configurationKey(agentIndex, configuration):
+    if configuration == None:
+        return 0
+    x, y = configuration.pos
+    return zobristKey('agent', agentIndex, float(x), float(y), configuration.direction)
+
+
+def _scaredKey(agentIndex, scaredTimer):
+    if scaredTimer == 0:
+        return 0
+    return zobristKey('scared', agentIndex, scaredTimer)
+
+
 class GameStateData:
+    __slots__ = ('food', 'capsules', 'agentStates', 'layout', 'score', 'scoreChange',
+                 '_eaten', '_foodEaten', '_foodAdded', '_capsuleEaten', '_agentMoved',
+                 '_lose', '_win', '_hash')
 
     def __init__(self, prevState=None):
         """
@@ -406,6 +608,9 @@ class GameStateData:
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self._hash = prevState._hash
+        else:
+            self._hash = 0
 
         self._foodEaten = None
         self._foodAdded = None
@@ -418,7 +623,8 @@ class GameStateData:
     def deepCopy(self):
         state = GameStateData(self)
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        # Layouts never change during a game, so every state shares one
+        state.layout = self.layout
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -431,6 +637,49 @@ class GameStateData:
             copiedStates.append(agentState.copy())
         return copiedStates
 
+    #############################################################
+    # Mutators used by the game rules.  They keep the Zobrist   #
+    # hash in step with the data, so always go through them.    #
+    #############################################################
+
+    def moveAgent(self, agentIndex, configuration):
+        agentState = self.agentStates[agentIndex]
+        self._hash ^= _configurationKey(agentIndex, agentState.configuration) ^ \
+            _configurationKey(agentIndex, configuration)
+        agentState.configuration = configuration
+
+    def setScaredTimer(self, agentIndex, scaredTimer):
+        agentState = self.agentStates[agentIndex]
+        self._hash ^= _scaredKey(agentIndex, agentState.scaredTimer) ^ \
+            _scaredKey(agentIndex, scaredTimer)
+        agentState.scaredTimer = scaredTimer
+
+    def removeFood(self, x, y):
+        # The food grid may be shared with other states, so copy before writing
+        self.food = self.food.copy()
+        self.food[x][y] = False
+        self._hash ^= zobristKey('food', x, y)
+
+    def removeCapsule(self, position):
+        # A new list, so an in-place move can be undone by restoring the old one
+        self.capsules = [c for c in self.capsules if c != position]
+        self._hash ^= zobristKey('capsule', position[0], position[1])
+
+    def computeHash(self):
+        """
+        Computes the Zobrist hash from scratch.  __hash__ uses the
+        incrementally maintained value instead; the two always agree.
+        """
+        h = 0
+        for agentIndex, agentState in enumerate(self.agentStates):
+            h ^= _configurationKey(agentIndex, agentState.configuration)
+            h ^= _scaredKey(agentIndex, agentState.scaredTimer)
+        for x, y in self.food.asList():
+            h ^= zobristKey('food', x, y)
+        for x, y in self.capsules:
+            h ^= zobristKey('capsule', x, y)
+        return h
+
     def __eq__(self, other):
         """
         Allows two states to be compared.
@@ -438,6 +687,8 @@ class GameStateData:
         if other == None:
             return False
         # TODO Check for type of other
+        if self._hash != other._hash:
+            return False
         if not self.agentStates == other.agentStates:
             return False
         if not self.food == other.food:
@@ -451,14 +702,11 @@ class GameStateData:
     def __hash__(self):
         """
         Allows states to be keys of dictionaries.
+
+        The Zobrist hash covers agents, food and capsules; only the score
+        is mixed in here.
         """
-        for i, state in enumerate(self.agentStates):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                # hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113 * hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575)
+        return hash((self._hash, self.score))
 
     def __str__(self):
         width, height = self.layout.width, self.layout.height
@@ -518,7 +766,7 @@ class GameStateData:
         """
         Creates an initial game state from a layout array (see layout.py).
         """
-        self.food = layout.food.copy()
+        self.food = BitGrid.fromGrid(layout.food)
         #self.capsules = []
         self.capsules = layout.capsules[:]
         self.layout = layout
@@ -536,6 +784,7 @@ class GameStateData:
             self.agentStates.append(AgentState(
                 Configuration(pos, Directions.STOP), isPacman))
         self._eaten = [False for a in self.agentStates]
+        self._hash = self.computeHash()
 
 
 try:
@@ -13,17 +13,37 @@
 
 
 from util import manhattanDistance
+from util import nearestPoint
 from game import Grid
+from array import array
+import hashlib
+import marshal
 import os
 import random
+import stat
+import sys
 from functools import reduce
 
 VISIBILITY_MATRIX_CACHE = {}
+LEGAL_ACTIONS_CACHE = {}
+MAZE_DISTANCES_CACHE = {}
+
+# Layouts loaded from files: real path -> ((modification time, size), Layout)
+LAYOUT_REGISTRY = {}
+
+# Directory for complete maze distance tables saved between runs, set with
+# the PACMAN_CACHE_DIR environment variable (e.g. ~/.cache/pacman).  Unset,
+# distances are computed as they are needed and kept in memory only.
+DISTANCE_CACHE_DIR = os.environ.get('PACMAN_CACHE_DIR', '')
 
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are treated as immutable: every GameState of a game, including
+    the deep copies handed to agents as observations, shares the same one.
+    Use deepCopy() for a private copy to modify.
     """
 
     def __init__(self, layoutText):
@@ -37,11 +57,68 @@ class Layout:
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
+        self._legalActionTables = None
         # self.initializeVisibilityMatrix()
 
     def getNumGhosts(self):
         return self.numGhosts
 
+    def getLegalActionTables(self):
+        """
+        Returns (pacmanActions, ghostActions), two read-only tables of the
+        legal actions at every open grid point of the layout:
+
+          pacmanActions[(x, y)] -> actions Pacman may take at (x, y)
+          ghostActions[((x, y), direction)] -> actions a ghost at (x, y)
+              that is travelling in `direction` may take
+
+        The entries are tuples in the same order the rules would produce.
+        Positions off the grid (mid-move ghosts) and cells on the border of
+        the board are not in the tables; the rules compute those directly.
+        Tables are built once per distinct layout.
+        """
+        if self._legalActionTables is None:
+            key = "\n".join(self.layoutText)
+            if key not in LEGAL_ACTIONS_CACHE:
+                LEGAL_ACTIONS_CACHE[key] = self._buildLegalActionTables()
+            self._legalActionTables = LEGAL_ACTIONS_CACHE[key]
+        return self._legalActionTables
+
+    def getMazeDistances(self):
+        """
+        Returns the MazeDistances table for this layout.  Tables are shared
+        by all layouts with the same text, and with DISTANCE_CACHE_DIR set
+        are completed and saved there so later runs can load them.
+        """
+        key = "\n".join(self.layoutText)
+        if key not in MAZE_DISTANCES_CACHE:
+            MAZE_DISTANCES_CACHE[key] = MazeDistances.load(self, key)
+        return MAZE_DISTANCES_CACHE[key]
+
+    def getMazeDistance(self, pos1, pos2):
+        return self.getMazeDistances().getDistance(pos1, pos2)
+
+    def _buildLegalActionTables(self):
+        from game import Actions, Configuration, Directions
+        pacmanActions = {}
+        ghostActions = {}
+        for x in range(1, self.width - 1):
+            for y in range(1, self.height - 1):
+                if self.walls[x][y]:
+                    continue
+                possible = Actions.getPossibleActions(
+                    Configuration((x, y), Directions.STOP), self.walls)
+                pacmanActions[(x, y)] = tuple(possible)
+                # Mirrors GhostRules.getLegalActions: ghosts cannot stop, and
+                # only turn around at dead ends
+                for direction in Directions.REVERSE:
+                    actions = [a for a in possible if a != Directions.STOP]
+                    reverse = Actions.reverseDirection(direction)
+                    if reverse in actions and len(actions) > 1:
+                        actions.remove(reverse)
+                    ghostActions[((x, y), direction)] = tuple(actions)
+        return pacmanActions, ghostActions
+
     def initializeVisibilityMatrix(self):
         global VISIBILITY_MATRIX_CACHE
         if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
@@ -97,7 +174,14 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        layout = Layout.__new__(Layout)
+        layout.__dict__.update(self.__dict__)
+        layout.walls = self.walls.copy()
+        layout.food = self.food.copy()
+        layout.capsules = self.capsules[:]
+        layout.agentPositions = self.agentPositions[:]
+        layout.layoutText = self.layoutText[:]
+        return layout
 
     def processLayoutText(self, layoutText):
         """
@@ -137,28 +221,291 @@ class Layout:
             self.numGhosts += 1
 
 
+class MazeDistances:
+    """
+    Shortest path distances through the maze between the open cells of a
+    layout.  Open cells are numbered in (x, y) order, and the distances from
+    one cell to all the others are found by a breadth first search the first
+    time that cell is asked about, then kept as a row of unsigned 16 bit ints
+    indexed by cell number.  As the maze is undirected, a row serves as a
+    column too.  Cells that cannot reach each other are UNREACHABLE apart.
+
+    A search only ever asks about the cells Pacman and the ghosts stand on,
+    so on a large maze few rows are built.  complete() builds all of them,
+    numCells squared entries.
+    """
+    UNREACHABLE = 65535
+    MAGIC = b'PMD1'
+
+    def __init__(self, layout):
+        self.cells = [(x, y) for x in range(layout.width)
+                      for y in range(layout.height) if not layout.walls[x][y]]
+        self.cellIds = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.numCells = len(self.cells)
+        self.neighbors = [[self.cellIds[cell] for cell in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+                           if cell in self.cellIds] for x, y in self.cells]
+        self.rows = {}
+
+    def getDistance(self, pos1, pos2):
+        """
+        Returns the maze distance between two positions.  Positions between
+        grid points (scared ghosts) are rounded to the nearest grid point.
+        """
+        i = self._cellId(pos1)
+        j = self._cellId(pos2)
+        row = self.rows.get(i)
+        if row is None:
+            row = self.rows.get(j)
+            if row is not None:
+                return row[i]
+            row = self.rows[i] = self._search(i)
+        return row[j]
+
+    def complete(self):
+        for i in range(self.numCells):
+            if i not in self.rows:
+                self.rows[i] = self._search(i)
+
+    def _cellId(self, pos):
+        i = self.cellIds.get(pos)
+        if i is None:
+            i = self.cellIds.get(nearestPoint(pos))
+            if i is None:
+                raise Exception('%s is not an open cell of the layout' % (pos,))
+        return i
+
+    def _search(self, source):
+        neighbors = self.neighbors
+        row = array('H', [MazeDistances.UNREACHABLE]) * self.numCells
+        row[source] = 0
+        frontier = [source]
+        distance = 0
+        while frontier:
+            distance += 1
+            nextFrontier = []
+            for cell in frontier:
+                for neighbor in neighbors[cell]:
+                    if row[neighbor] == MazeDistances.UNREACHABLE:
+                        row[neighbor] = distance
+                        nextFrontier.append(neighbor)
+            frontier = nextFrontier
+        return row
+
+    def load(layout, key):
+        """
+        Returns the distances for a layout.  With DISTANCE_CACHE_DIR set, the
+        complete table is loaded from there, or built and saved for later
+        runs; this is best effort, and unreadable or stale files are rebuilt.
+        Otherwise rows are computed as they are needed.
+        """
+        table = MazeDistances(layout)
+        if not DISTANCE_CACHE_DIR:
+            return table
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        path = os.path.join(DISTANCE_CACHE_DIR, '%s-%s.dist' % (digest, sys.byteorder))
+        n = table.numCells
+        try:
+            with open(path, 'rb') as f:
+                contents = f.read()
+            if contents[:4] == MazeDistances.MAGIC:
+                distances = array('H')
+                distances.frombytes(contents[4:])
+                if len(distances) == n * n:
+                    table.rows = dict((i, distances[i * n:(i + 1) * n]) for i in range(n))
+                    return table
+        except (IOError, OSError, ValueError):
+            pass
+
+        table.complete()
+        try:
+            if not os.path.isdir(DISTANCE_CACHE_DIR):
+                os.makedirs(DISTANCE_CACHE_DIR)
+            tmpPath = '%s.%d.tmp' % (path, os.getpid())
+            with open(tmpPath, 'wb') as f:
+                f.write(MazeDistances.MAGIC)
+                for i in range(n):
+                    f.write(table.rows[i].tobytes())
+            os.replace(tmpPath, path)
+        except (IOError, OSError):
+            pass
+        return table
+    load = staticmethod(load)
+
+
+class CompiledLayout:
+    """
+    The precompiled form of a layout, which loads without parsing the text
+    or building the legal action tables.  A file holds MAGIC and the marshal
+    format version (a byte) followed by a marshalled tuple of
+
+      (layoutText, width, height, wallBits, foodBits, capsules,
+       agentPositions, numGhosts, pacmanActions, ghostActions)
+
+    where the wall and food bitmaps have cell (x, y) at bit x * height + y,
+    as in a BitGrid, and the action tables are getLegalActionTables()'s.
+    The text is kept since it names the layout in the shared caches.
+
+    Marshal data is specific to the Python version, so loads raises a
+    ValueError for files it cannot read, and tryToLoad then falls back to
+    the .lay file the layout was compiled from.
+    """
+    MAGIC = b'PLC1'
+
+    def dumps(layout):
+        pacmanActions, ghostActions = layout.getLegalActionTables()
+        contents = (tuple(layout.layoutText), layout.width, layout.height,
+                    packGrid(layout.walls), packGrid(layout.food), tuple(layout.capsules),
+                    tuple(layout.agentPositions), layout.numGhosts, pacmanActions, ghostActions)
+        return CompiledLayout.MAGIC + bytes([marshal.version]) + marshal.dumps(contents, marshal.version)
+    dumps = staticmethod(dumps)
+
+    def loads(contents):
+        if contents[:4] != CompiledLayout.MAGIC or contents[4:5] != bytes([marshal.version]):
+            raise ValueError('Not a compiled layout of this Python version')
+        try:
+            (layoutText, width, height, wallBits, foodBits, capsules, agentPositions,
+             numGhosts, pacmanActions, ghostActions) = marshal.loads(contents[5:])
+        except (EOFError, TypeError, ValueError):
+            raise ValueError('Corrupt compiled layout')
+        layout = Layout.__new__(Layout)
+        layout.width = width
+        layout.height = height
+        layout.walls = unpackGrid(width, height, wallBits)
+        layout.food = unpackGrid(width, height, foodBits)
+        layout.capsules = list(capsules)
+        layout.agentPositions = list(agentPositions)
+        layout.numGhosts = numGhosts
+        layout.layoutText = list(layoutText)
+        layout.totalFood = bin(foodBits).count('1')
+        key = "\n".join(layout.layoutText)
+        layout._legalActionTables = LEGAL_ACTIONS_CACHE.setdefault(key, (pacmanActions, ghostActions))
+        return layout
+    loads = staticmethod(loads)
+
+
+def packGrid(grid):
+    bits = 0
+    for x, y in grid.asList():
+        bits |= 1 << (x * grid.height + y)
+    return bits
+
+
+def unpackGrid(width, height, bits):
+    grid = Grid(width, height)
+    grid.data = [[(bits >> (x * height + y)) & 1 == 1 for y in range(height)]
+                 for x in range(width)]
+    return grid
+
+
+def compileLayout(layout, filename):
+    """
+    Writes the precompiled form of a layout, conventionally to a .layc
+    file, which getLayout loads like a .lay file.
+    """
+    tmpName = '%s.%d.tmp' % (filename, os.getpid())
+    with open(tmpName, 'wb') as f:
+        f.write(CompiledLayout.dumps(layout))
+    os.replace(tmpName, filename)
+
+
 def getLayout(name, back=2):
-    if name.endswith('.lay'):
-        layout = tryToLoad('layouts/' + name)
-        if layout == None:
-            layout = tryToLoad(name)
-    else:
-        layout = tryToLoad('layouts/' + name + '.lay')
-        if layout == None:
-            layout = tryToLoad(name + '.lay')
-    if layout == None and back >= 0:
-        curdir = os.path.abspath('.')
-        os.chdir('..')
-        layout = getLayout(name, back - 1)
-        os.chdir(curdir)
-    return layout
+    """
+    Loads a layout by name from layouts/ or the given path, looking in the
+    working directory, then up to `back` + 1 of its parents and finally
+    next to this module.  Names without a .lay or .layc extension get .lay.
+    Returns a private copy of the layout, which the caller may change, or
+    None if there is no such layout.
+
+    The working directory is never changed, so this is safe to call from
+    several threads.
+    """
+    for fullname in layoutPaths(name, back):
+        layout = tryToLoad(fullname)
+        if layout != None:
+            return layout
+    return None
+
+
+def layoutPaths(name, back=2):
+    """
+    The paths getLayout tries, in order.
+    """
+    if not (name.endswith('.lay') or name.endswith('.layc')):
+        name = name + '.lay'
+    directory = os.path.abspath('.')
+    directories = [directory]
+    for level in range(back + 1):
+        directory = os.path.dirname(directory)
+        directories.append(directory)
+    directories.append(os.path.dirname(os.path.abspath(__file__)))
+    paths = []
+    for directory in directories:
+        paths.append(os.path.join(directory, 'layouts', name))
+        paths.append(os.path.join(directory, name))
+    return paths
 
 
 def tryToLoad(fullname):
-    if(not os.path.exists(fullname)):
+    """
+    Returns a private copy of the layout in a .lay or compiled layout file,
+    or None if there is no such file.  Each file is only read and parsed
+    again once its modification time or size changes; until then the copies
+    come from LAYOUT_REGISTRY.
+    """
+    try:
+        status = os.stat(fullname)
+    except (IOError, OSError):
         return None
-    f = open(fullname)
+    if not stat.S_ISREG(status.st_mode):
+        return None
+    key = os.path.realpath(fullname)
+    signature = (status.st_mtime_ns, status.st_size)
+    entry = LAYOUT_REGISTRY.get(key)
+    if entry is None or entry[0] != signature:
+        entry = LAYOUT_REGISTRY[key] = (signature, readLayout(fullname))
+    return entry[1].deepCopy()
+
+
+def readLayout(fullname):
+    with open(fullname, 'rb') as f:
+        contents = f.read()
+    if contents[:4] != CompiledLayout.MAGIC:
+        return Layout([line.strip() for line in contents.decode('utf-8').splitlines()])
     try:
-        return Layout([line.strip() for line in f])
-    finally:
-        f.close()
+        return CompiledLayout.loads(contents)
+    except ValueError:
+        source = os.path.splitext(fullname)[0] + '.lay'
+        if source == fullname or not os.path.isfile(source):
+            raise Exception(fullname + ' cannot be loaded and there is no .lay file to load instead')
+        return readLayout(source)
+
+
+def readCommand(argv):
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python layout.py <options> <layouts>
+    EXAMPLES:   (1) python layout.py mediumClassic originalClassic
+                    - writes layouts/mediumClassic.layc and layouts/originalClassic.layc
+                (2) python layout.py -d /tmp/layouts layouts/*.lay
+    """
+    parser = OptionParser(usageStr)
+    parser.add_option('-d', '--directory', dest='directory', default=None,
+                      help='write the compiled layouts here [Default: next to each layout]')
+    options, names = parser.parse_args(argv)
+    if len(names) == 0:
+        raise Exception('No layouts given')
+    return options, names
+
+
+if __name__ == '__main__':
+    options, names = readCommand(sys.argv[1:])
+    for name in names:
+        sources = [path for path in layoutPaths(name) if os.path.isfile(path)]
+        if not sources:
+            raise Exception("The layout " + name + " cannot be found")
+        source = sources[0]
+        layout = tryToLoad(source)
+        base = os.path.splitext(os.path.basename(source))[0] + '.layc'
+        filename = os.path.join(options.directory or os.path.dirname(source), base)
+        compileLayout(layout, filename)
+        print('Wrote ' + filename)
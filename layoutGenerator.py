@@ -0,0 +1,189 @@
+# layoutGenerator.py
+# ------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Generates random mazes, for measuring the engine and the agents on boards
+much larger than the ones in layouts/:
+
+  python layoutGenerator.py --width 101 --height 101 --seed 1 -o big.lay
+  python pacman.py -l big.lay -p AlphaBetaAgent -q
+
+The same parameters and seed always give the same maze.  A maze starts as
+a spanning tree of passages carved between the cells at odd coordinates,
+so every open square is reachable (for an even width or height, the maze
+is carved one column or row smaller and a random column or row of it is
+doubled, which keeps it connected).  `loopiness` is the fraction of the
+walls left between neighbouring cells that are knocked out to make loops,
+and further walls are removed at random until at most `wallDensity` of the
+squares inside the border are walls (a tree maze is about half walls, so
+larger densities leave it as it is).  Removing walls never disconnects the
+maze.  Pacman starts on a random square and the ghosts on distinct squares
+among the farthest from Pacman; food and capsules go on the other squares.
+"""
+
+import random
+import sys
+
+import layout
+
+
+def generateLayoutText(width, height, wallDensity=0.45, loopiness=0.2, numGhosts=2,
+                       foodDensity=0.6, capsules=4, seed=None):
+    """
+    Returns the rows of a random maze in the .lay format, top row first.
+    """
+    if width < 5 or height < 5:
+        raise Exception('Mazes must be at least 5x5')
+    rng = random.Random(seed)
+    fullWidth, fullHeight = width, height
+    width, height = width - 1 + width % 2, height - 1 + height % 2 #cells need odd dimensions
+    walls = [[True] * height for x in range(width)]
+
+    # Carve a spanning tree between the cells at odd coordinates
+    cells = [(x, y) for x in range(1, width - 1, 2) for y in range(1, height - 1, 2)]
+    start = rng.choice(cells)
+    walls[start[0]][start[1]] = False
+    stack = [start]
+    while stack:
+        x, y = stack[-1]
+        unvisited = [(x + dx, y + dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                     if 0 < x + dx < width - 1 and 0 < y + dy < height - 1 and walls[x + dx][y + dy]]
+        if not unvisited:
+            stack.pop()
+            continue
+        nx, ny = rng.choice(unvisited)
+        walls[(x + nx) // 2][(y + ny) // 2] = False
+        walls[nx][ny] = False
+        stack.append((nx, ny))
+
+    # Knock out walls between cells to make loops
+    between = [(x, y) for x in range(1, width - 1) for y in range(1, height - 1)
+               if walls[x][y] and (x % 2 != y % 2) and
+               ((x % 2 == 0 and x + 1 < width - 1) or (y % 2 == 0 and y + 1 < height - 1))]
+    rng.shuffle(between)
+    for x, y in between[:int(round(loopiness * len(between)))]:
+        walls[x][y] = False
+
+    # Then thin the walls down to the density
+    inner = [(x, y) for x in range(1, width - 1) for y in range(1, height - 1) if walls[x][y]]
+    excess = len(inner) - int(wallDensity * (width - 2) * (height - 2))
+    if excess > 0:
+        for x, y in rng.sample(inner, excess):
+            walls[x][y] = False
+
+    # Double a column and a row to make up even dimensions
+    if width < fullWidth:
+        x = rng.randrange(1, width - 1)
+        walls.insert(x, walls[x][:])
+        width += 1
+    if height < fullHeight:
+        y = rng.randrange(1, height - 1)
+        for column in walls:
+            column.insert(y, column[y])
+        height += 1
+
+    # Pacman anywhere, the ghosts on the farthest squares from Pacman
+    free = [(x, y) for x in range(width) for y in range(height) if not walls[x][y]]
+    if len(free) < numGhosts + 2:
+        raise Exception('The maze is too small for %d ghosts' % numGhosts)
+    pacman = rng.choice(free)
+    distances = layout.MazeDistances(layout.Layout(layoutText(walls, width, height, {})))
+    others = sorted([cell for cell in free if cell != pacman], key=lambda cell: -distances.getDistance(pacman, cell))
+    ghosts = rng.sample(others[:max(numGhosts, len(others) // 4)], numGhosts)
+
+    squares = [cell for cell in others if cell not in ghosts]
+    rng.shuffle(squares)
+    capsules = min(capsules, len(squares) - 1)  # leaving at least one square for food
+    capsuleSquares = squares[:capsules]
+    foodSquares = squares[capsules:]
+    foodSquares = foodSquares[:max(int(foodDensity * len(foodSquares)), 1)]
+
+    contents = dict([(square, '.') for square in foodSquares] + [(square, 'o') for square in capsuleSquares] +
+                    [(square, 'G') for square in ghosts] + [(pacman, 'P')])
+    return layoutText(walls, width, height, contents)
+
+
+def layoutText(walls, width, height, contents):
+    """
+    The rows of the .lay text, top row first, of the walls and the
+    {(x, y): character} contents of the open squares.
+    """
+    return [''.join(['%' if walls[x][y] else contents.get((x, y), ' ') for x in range(width)])
+            for y in range(height - 1, -1, -1)]
+
+
+def generateLayout(width, height, wallDensity=0.45, loopiness=0.2, numGhosts=2,
+                   foodDensity=0.6, capsules=4, seed=None):
+    """
+    Returns a random maze as a Layout; see generateLayoutText.
+    """
+    return layout.Layout(generateLayoutText(width, height, wallDensity, loopiness, numGhosts,
+                                            foodDensity, capsules, seed))
+
+
+def readCommand(argv):
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python layoutGenerator.py <options>
+    EXAMPLES:   (1) python layoutGenerator.py --width 31 --height 15
+                    - prints a random 31x15 maze
+                (2) python layoutGenerator.py -W 151 -H 151 -k 4 --seed 7 -o layouts/huge.lay --compile
+                    - writes a 151x151 maze with 4 ghosts and its precompiled form, huge.layc
+    """
+    parser = OptionParser(usageStr)
+    parser.add_option('-W', '--width', dest='width', type='int', default=101,
+                      help='columns, including the border [Default: %default]')
+    parser.add_option('-H', '--height', dest='height', type='int', default=101,
+                      help='rows, including the border [Default: %default]')
+    parser.add_option('--walls', dest='wallDensity', type='float', default=0.45,
+                      help='most walls, as a fraction of the squares inside the border [Default: %default]')
+    parser.add_option('--loops', dest='loopiness', type='float', default=0.2,
+                      help='fraction of the walls between passages removed to make loops [Default: %default]')
+    parser.add_option('-k', '--numghosts', dest='numGhosts', type='int', default=2,
+                      help='the number of ghosts [Default: %default]')
+    parser.add_option('--food', dest='foodDensity', type='float', default=0.6,
+                      help='fraction of the free squares with food [Default: %default]')
+    parser.add_option('--capsules', dest='capsules', type='int', default=4,
+                      help='the number of capsules [Default: %default]')
+    parser.add_option('--seed', dest='seed', default=None,
+                      help='random seed, to make the maze again [Default: a new maze each run]')
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help='write the maze to this .lay file [Default: print it]')
+    parser.add_option('--compile', dest='compile', action='store_true', default=False,
+                      help='also write the precompiled .layc next to the output file')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    if options.compile and not options.output:
+        raise Exception('--compile needs an --output file')
+    return options
+
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    text = generateLayoutText(options.width, options.height, options.wallDensity, options.loopiness,
+                              options.numGhosts, options.foodDensity, options.capsules, options.seed)
+    if options.output:
+        f = open(options.output, 'w')
+        try:
+            f.write('\n'.join(text) + '\n')
+        finally:
+            f.close()
+        print('Wrote ' + options.output)
+        if options.compile:
+            compiled = options.output[:-4] + '.layc' if options.output.endswith('.lay') else options.output + '.layc'
+            layout.compileLayout(layout.Layout(text), compiled)
+            print('Wrote ' + compiled)
+    else:
+        print('\n'.join(text))
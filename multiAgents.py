@@ -14,7 +14,16 @@
 
 from util import manhattanDistance
 from game import Directions
+from game import Actions
+from ghostAgents import DirectionalGhost
 import random, util
+import collections
+import concurrent.futures
+import copy
+import math
+import multiprocessing
+import threading
+import time
 
 from game import Agent
 
@@ -68,18 +77,16 @@ class ReflexAgent(Agent):
         """
         # Useful information you can extract from a GameState (pacman.py)
         successorGameState = currentGameState.generatePacmanSuccessor(action)
-        newPos = successorGameState.getPacmanPosition()
-        newFood = successorGameState.getFood().asList()
-        newGhostStates = successorGameState.getGhostStates()
         # newScaredTimes = [ghostState.scaredTimer for ghostState in newGhostStates]
 
         "*** YOUR CODE HERE ***"
         #the farther the ghost from pacman, the higher the score should be.
         #the closer the food from pacman, the higher the score should be.
         #evaluationFunction = current_score * ∑(distance_to_ghost/(total_distance_to_food^2)) + 0.1 (bias)
+        #the distances are features cached across calls, see FeatureCache
 
-        dist_ghost = [manhattanDistance(newPos, ghostState.getPosition()) for ghostState in newGhostStates]
-        food_distance = sum([manhattanDistance(newPos, food) for food in newFood]) if newFood else 1e-1       
+        dist_ghost = ghostDistances(successorGameState)
+        food_distance = foodDistance(successorGameState)
         food_ghost = sum([x/(food_distance**2) for x in dist_ghost]) + 1e-1
 
         return successorGameState.getScore() * food_ghost
@@ -94,6 +101,290 @@ def scoreEvaluationFunction(currentGameState):
     """
     return currentGameState.getScore()
 
+def scoreBounds(gameState, pacmanMoves, ghostMoves):
+    """
+    Bounds on the score of every state reachable from gameState within the
+    given numbers of Pacman and ghost moves, following the rules in pacman.py:
+    each Pacman move costs a point and a pellet is worth 10, the last one 500
+    more; eating a scared ghost is worth 200 and being caught costs 500 per
+    ghost, which ends the game.  ExpectimaxAgent's star pruning uses these
+    with scoreEvaluationFunction.
+    """
+    score = gameState.getScore()
+    if pacmanMoves + ghostMoves == 0:
+        return score, score
+    numGhosts = gameState.getNumAgents() - 1
+    numFood = gameState.getNumFood()
+    scared = len([ghost for ghost in gameState.getGhostStates() if ghost.scaredTimer > 0])
+    ghostsEaten = scared #each capsule Pacman can reach scares every ghost again
+    if pacmanMoves > 0:
+        ghostsEaten += len(gameState.getCapsules()) * numGhosts
+    high = score + 9 * min(pacmanMoves, numFood) + 200 * ghostsEaten
+    if numFood <= pacmanMoves:
+        high += 500
+    low = score - pacmanMoves - 500 * numGhosts
+    return low, high
+
+def isTrue(value):
+    """
+    Agent options arrive from the command line as strings ("-a opt=True") or
+    as 1 when given without a value ("-a opt"); this reads them as booleans.
+    """
+    return str(value).lower() in ('true', '1', 'yes')
+
+# Kinds of value a TranspositionTable entry can hold
+EXACT, LOWERBOUND, UPPERBOUND = 'exact', 'lower', 'upper'
+
+class TranspositionTable:
+    """
+    A bounded cache of search results shared by the MultiAgentSearchAgents.
+
+    Entries are keyed on the state's hash (the Zobrist hash for a GameState),
+    the number of plies left to search below it and the index of the agent to
+    move.  They hold the backed-up value, the kind of bound that value is
+    (EXACT, or LOWERBOUND/UPPERBOUND after an alpha-beta cutoff) and the best
+    action found.  When the table is full the least recently used entry is
+    evicted.
+
+    An entry also remembers the `variant` of the tree it was searched in
+    (which ghosts were frozen or advanced, see irrelevantGhosts): a lookup
+    in a different variant misses, since the value may differ.
+    """
+
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, state, depth, agentIndex, variant=None):
+        """
+        Returns the (value, bound, action) stored for the node, or None.
+        """
+        key = (hash(state), depth, agentIndex)
+        entry = self.entries.get(key)
+        if entry is None or entry[3] != variant:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[:3]
+
+    def store(self, state, depth, agentIndex, value, bound, action, variant=None):
+        key = (hash(state), depth, agentIndex)
+        self.entries[key] = (value, bound, action, variant)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def bestAction(self, state, depth, agentIndex):
+        """
+        Returns the best action stored for the node by a search to the same
+        depth or, failing that, one ply shallower (e.g. the previous round of
+        iterative deepening), for use in move ordering.  Any variant will do
+        for that.  Does not count towards the hit/miss statistics.
+        """
+        stateHash = hash(state)
+        for d in (depth, depth - 1):
+            entry = self.entries.get((stateHash, d, agentIndex))
+            if entry is not None:
+                return entry[2]
+        return None
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def hitRate(self):
+        probes = self.hits + self.misses
+        return float(self.hits) / probes if probes else 0.0
+
+    def __len__(self):
+        return len(self.entries)
+
+class MoveOrdering:
+    """
+    Orders the actions at alpha-beta nodes, for Pacman and ghosts alike:
+
+      1. the hash move, the best action the transposition table holds for
+         the node (or the previous iteration's best root action),
+      2. killer moves, the most recent actions that caused a cutoff at the
+         same ply for the same agent,
+      3. the remaining actions by history score, which grows with the depth
+         of every cutoff an action caused for that agent at that position.
+
+    It also counts how often cutoffs happen at the first child searched,
+    which is 1.0 for a perfectly ordered tree.
+    """
+
+    def __init__(self, numKillers=2):
+        self.numKillers = numKillers
+        self.killers = {}
+        self.history = collections.defaultdict(int)
+        self.nodes = 0
+        self.cutoffs = 0
+        self.firstChildCutoffs = 0
+
+    def newSearch(self):
+        """
+        Called at the start of each search: killers only apply within one
+        search, while history carries over with its scores halved.
+        """
+        self.killers = {}
+        for key in self.history:
+            self.history[key] //= 2
+
+    def order(self, state, ply, agentIndex, actions, hashAction=None):
+        self.nodes += 1
+        position = self.agentPosition(state, agentIndex)
+        history = self.history
+        actions = sorted(actions, key=lambda action: -history[(agentIndex, position, action)])
+        first = [action for action in self.killers.get((ply, agentIndex), ()) if action in actions]
+        if hashAction in actions:
+            first = [hashAction] + [action for action in first if action != hashAction]
+        return first + [action for action in actions if action not in first]
+
+    def recordCutoff(self, state, ply, agentIndex, action, childIndex, remainingDepth):
+        self.cutoffs += 1
+        if childIndex == 0:
+            self.firstChildCutoffs += 1
+        killers = self.killers.setdefault((ply, agentIndex), [])
+        if action not in killers:
+            killers.insert(0, action)
+            del killers[self.numKillers:]
+        position = self.agentPosition(state, agentIndex)
+        self.history[(agentIndex, position, action)] += remainingDepth * remainingDepth
+
+    def agentPosition(self, state, agentIndex):
+        # Only GameStates have positions; other states share one history row
+        if not hasattr(state, 'data'):
+            return None
+        return state.data.agentStates[agentIndex].configuration.pos
+
+    def firstChildCutoffRate(self):
+        return float(self.firstChildCutoffs) / self.cutoffs if self.cutoffs else 0.0
+
+    def cutoffRate(self):
+        return float(self.cutoffs) / self.nodes if self.nodes else 0.0
+
+class GhostModel:
+    """
+    The probabilities an ExpectimaxAgent gives each ghost's actions.
+
+    By default these come from a GhostAgent's getDistribution (e.g.
+    DirectionalGhost, which the games are often played against); a learned
+    model subclasses GhostModel and overrides computeDistribution.  Actions
+    less likely than `threshold` are dropped and the rest renormalised, so
+    their subtrees are never searched.  Distributions are memoized per state
+    and ghost in a bounded table, since building them is costly.
+    """
+
+    def __init__(self, ghostType=DirectionalGhost, threshold=0.0, capacity=100000):
+        self.ghostType = ghostType
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ghosts = {}
+        self.distributions = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.pruned = 0 #actions dropped for falling below the threshold
+
+    def getDistribution(self, state, ghostIndex):
+        """
+        Returns a list of (action, probability) pairs, in the order of the
+        ghost's legal actions, whose probabilities sum to 1.
+        """
+        key = (hash(state), ghostIndex)
+        distribution = self.distributions.get(key)
+        if distribution is not None:
+            self.distributions.move_to_end(key)
+            self.hits += 1
+            return distribution
+        self.misses += 1
+        distribution = self.computeDistribution(state, ghostIndex)
+        self.distributions[key] = distribution
+        if len(self.distributions) > self.capacity:
+            self.distributions.popitem(last=False)
+        return distribution
+
+    def computeDistribution(self, state, ghostIndex):
+        if ghostIndex not in self.ghosts:
+            self.ghosts[ghostIndex] = self.ghostType(ghostIndex)
+        counter = self.ghosts[ghostIndex].getDistribution(state)
+        distribution = [(action, counter[action]) for action in state.getLegalActions(ghostIndex)
+                        if counter[action] > 0]
+        if not distribution: #the ghost agent gave no probabilities; fall back to uniform
+            distribution = [(action, 1.0) for action in state.getLegalActions(ghostIndex)]
+        likely = [(action, p) for action, p in distribution if p >= self.threshold]
+        if likely: #never prune every action; keep the distribution as it is instead
+            self.pruned += len(distribution) - len(likely)
+            distribution = likely
+        total = float(sum(p for _, p in distribution))
+        return [(action, p / total) for action, p in distribution]
+
+    def clear(self):
+        self.distributions.clear()
+        self.hits = self.misses = self.pruned = 0
+
+    def hitRate(self):
+        probes = self.hits + self.misses
+        return float(self.hits) / probes if probes else 0.0
+
+    def __len__(self):
+        return len(self.distributions)
+
+class SearchStats:
+    """
+    What one getAction of a search agent did, recorded when pacman.py runs
+    with --searchStats.  Successors generated are counted per depth and per
+    agent index; leaves are evaluations, of which terminals were won or
+    lost states.  Times are in seconds: evaluationTime and successorTime
+    are spent inside the evaluation function and generating successors,
+    wallTime on the whole getAction.  `counters` holds what the agent's
+    searchCounters changed by, e.g. cutoffs and cache hits.  Only work done
+    in this process is counted, not that of an agent's worker processes, and
+    `game` numbers the games this copy of the agent has played.
+    """
+
+    def __init__(self, agent, game, move):
+        self.agent = agent
+        self.game = game
+        self.move = move
+        self.depth = 0
+        self.nodesByDepth = collections.defaultdict(int)
+        self.nodesByAgent = collections.defaultdict(int)
+        self.evaluations = 0
+        self.terminals = 0
+        self.branchingFactor = 0.0
+        self.evaluationTime = 0.0
+        self.successorTime = 0.0
+        self.wallTime = 0.0
+        self.seeded = False
+        self.relevantGhosts = None
+        self.counters = {}
+
+    def asDict(self):
+        record = collections.OrderedDict([
+            ('agent', self.agent), ('game', self.game), ('move', self.move), ('depth', self.depth),
+            ('nodes', sum(self.nodesByDepth.values())),
+            ('nodesByDepth', dict((str(d), n) for d, n in sorted(self.nodesByDepth.items()))),
+            ('nodesByAgent', dict((str(i), n) for i, n in sorted(self.nodesByAgent.items()))),
+            ('evaluations', self.evaluations), ('terminals', self.terminals),
+            ('branchingFactor', self.branchingFactor), ('evaluationTime', self.evaluationTime),
+            ('successorTime', self.successorTime), ('wallTime', self.wallTime), ('seeded', self.seeded)])
+        if self.relevantGhosts is not None:
+            record['relevantGhosts'] = self.relevantGhosts
+        record.update(sorted(self.counters.items()))
+        return record
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a search when the agent's time budget for the move is spent.
+    """
+    pass
+
 class MultiAgentSearchAgent(Agent):
     """
     This class provides some common elements to all of your
@@ -109,10 +400,505 @@ class MultiAgentSearchAgent(Agent):
     is another abstract class.
     """
 
-    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2'):
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', transposition = 'False', ttSize = '100000',
+                 inPlace = 'False', timeLimit = '0.5', maxDepth = '100', workers = '1', ponder = 'False',
+                 irrelevantGhosts = 'None', relevanceRadius = 'auto', report = 'False'):
         self.index = 0 # Pacman is always agent index 0
         self.evaluationFunction = util.lookup(evalFn, globals())
-        self.depth = int(depth)
+        # depth=auto searches iteratively deeper until timeLimit seconds per move are spent
+        self.iterative = str(depth) == 'auto'
+        self.depth = 1 if self.iterative else int(depth)
+        self.timeLimit = float(timeLimit)
+        self.maxDepth = int(maxDepth)
+        self.deadline = None #set while a time-limited search is running
+        self.rootAction = None #best root action of the previous iteration, searched first
+        self.completedDepth = 0 #depth of the last search that finished
+        # Opt-in: a table of searched nodes that persists across getAction calls
+        self.transpositionTable = TranspositionTable(int(ttSize)) if isTrue(transposition) else None
+        # Opt-in: walk the tree with one working GameState (apply/undo) instead of generating successors
+        self.inPlace = isTrue(inPlace)
+        # Opt-in: split the root across a pool of worker processes kept for the whole game
+        self.workers = int(workers)
+        self.pool = None
+        self.poolLayout = None
+        self.sharedAlpha = None
+        # Opt-in: while the ghosts move, search the states their replies can lead to in a
+        # background thread, so the next getAction finds its root in the transposition table
+        self.ponder = isTrue(ponder)
+        if self.ponder and self.transpositionTable is None:
+            self.transpositionTable = TranspositionTable(int(ttSize))
+        self.ponderThread = None
+        self.ponderStop = None
+        self.pondered = 0 #next roots searched while pondering after the last move
+        self.seeded = False #whether the last move's root was already in the table
+        # Opt-in: ghosts too far away to reach Pacman within the search are not branched on.
+        # They are frozen in place or advanced along one deterministic move instead.
+        if irrelevantGhosts not in ('None', 'freeze', 'advance'):
+            raise Exception('irrelevantGhosts must be freeze or advance')
+        self.irrelevantGhosts = None if irrelevantGhosts == 'None' else irrelevantGhosts
+        self.relevanceRadius = None if relevanceRadius == 'auto' else int(relevanceRadius)
+        self.frozenGhosts = frozenset()
+        self.advancedGhosts = frozenset()
+        self.nodes = 0 #successors generated by this agent's searches
+        self.branchingFactor = 0.0 #effective branching factor per full ply of the last search
+        self.relevanceSearches = 0
+        self.relevantGhosts = 0 #ghosts branched on, summed over the searches
+        self.branchingTotal = 0.0
+        # Opt-in: print a summary of the search diagnostics (ghost relevance, Star pruning) when each game ends
+        self.report = isTrue(report)
+        # Set by pacman.py --searchStats: each getAction then sends a SearchStats record to statsSink
+        self.statsSink = None
+        self.stats = None #the record of the search in progress
+        self.games = 0
+        self.moves = 0
+
+    def registerInitialState(self, gameState):
+        self.stopPondering()
+        self.games += 1
+        self.moves = 0
+        self.relevanceSearches = 0 #the ghost relevance summary covers one game
+        self.relevantGhosts = 0
+        self.branchingTotal = 0.0
+        if self.transpositionTable is not None:
+            self.transpositionTable.clear() #results from a previous game are of no use
+        if self.workers > 1:
+            self.startPool(gameState)
+
+    def final(self, gameState):
+        self.stopPondering()
+        self.stopPool()
+        if self.report and self.irrelevantGhosts is not None and self.relevanceSearches:
+            print('Ghost relevance: %.2f of %d ghosts branched on, effective branching factor %.1f per ply' %
+                  (float(self.relevantGhosts) / self.relevanceSearches, gameState.getNumAgents() - 1,
+                   self.branchingTotal / self.relevanceSearches))
+
+    def __getstate__(self):
+        #the pool and ponder thread stay with the agent that owns them; copies sent to workers search serially
+        state = self.__dict__.copy()
+        state['pool'] = None
+        state['sharedAlpha'] = None
+        state['ponderThread'] = None
+        state['ponderStop'] = None
+        return state
+
+    def probe(self, state, depth, agentIndex):
+        """
+        Returns the transposition table entry for the node at `depth` with
+        `agentIndex` to move, or None if there is no table or no entry.
+        """
+        if self.transpositionTable is None:
+            return None
+        return self.transpositionTable.lookup(state, self.depth - depth, agentIndex, self.searchVariant())
+
+    def record(self, state, depth, agentIndex, value, bound, action):
+        if self.transpositionTable is not None:
+            self.transpositionTable.store(state, self.depth - depth, agentIndex, value, bound, action,
+                                          self.searchVariant())
+
+    def searchVariant(self):
+        """
+        The ghosts the current search freezes and advances, which change the
+        tree and so the values the transposition table may reuse.
+        """
+        if not (self.frozenGhosts or self.advancedGhosts):
+            return None
+        return (self.frozenGhosts, self.advancedGhosts)
+
+    def collectSearchStats(self, sink):
+        """
+        Sends a SearchStats record of every following getAction to
+        sink.write (see pacman.py --searchStats).
+        """
+        self.statsSink = sink
+
+    def searchCounters(self):
+        """
+        Cumulative counters whose change over one getAction goes into its
+        SearchStats record.  Subclasses add their own.
+        """
+        counters = {'cutoffs': 0}
+        if self.transpositionTable is not None:
+            counters['transpositionHits'] = self.transpositionTable.hits
+            counters['transpositionMisses'] = self.transpositionTable.misses
+        for name, (hits, misses, _) in featureCacheStats().items():
+            counters[name + 'Hits'] = hits
+            counters[name + 'Misses'] = misses
+        return counters
+
+    def search(self, gameState, rootSearch):
+        """
+        Returns the action searchMove chooses, recording a SearchStats of
+        the search when there is a statsSink.  With ponder set, pondering
+        starts once the record is written, so none of its work is counted
+        in this move's record.
+        """
+        self.stopPondering()
+        self.moves += 1
+        if self.statsSink is None:
+            action = self.searchMove(gameState, rootSearch)
+        else:
+            action = self.recordSearch(gameState, rootSearch)
+        if self.ponder:
+            self.startPondering(gameState, action, rootSearch)
+        return action
+
+    def recordSearch(self, gameState, rootSearch):
+        self.stats = stats = SearchStats(self.__class__.__name__, self.games, self.moves)
+        counters = self.searchCounters()
+        start = time.time()
+        try:
+            action = self.searchMove(gameState, rootSearch)
+        finally:
+            self.stats = None
+        stats.wallTime = time.time() - start
+        stats.depth = self.completedDepth
+        stats.branchingFactor = self.branchingFactor
+        stats.seeded = self.seeded
+        stats.counters = dict((name, value - counters.get(name, 0))
+                              for name, value in self.searchCounters().items())
+        if self.irrelevantGhosts is not None:
+            stats.relevantGhosts = gameState.getNumAgents() - 1 - len(self.frozenGhosts | self.advancedGhosts)
+        self.statsSink.write(stats)
+        return action
+
+    def searchMove(self, gameState, rootSearch):
+        """
+        Returns rootSearch(gameState), the best action found by searching
+        self.depth plies.  With depth=auto, searches one ply deeper at a time
+        until timeLimit seconds have passed, trying the previous iteration's
+        best action first, and returns the action of the deepest search that
+        completed.  The first ply always completes.
+
+        A root the transposition table already holds an exact result for,
+        e.g. one searched while pondering, is not searched again.
+        """
+        if self.workers > 1:
+            rootSearch = self.searchRootInParallel
+        if not self.iterative:
+            self.classifyGhosts(gameState) #the root entry must come from the same variant of the tree
+            entry = self.probe(gameState, 1, self.index)
+            self.seeded = entry is not None and entry[1] == EXACT
+            action = entry[2] if self.seeded else self.searchRoot(gameState, rootSearch)
+            self.completedDepth = self.depth
+            return action
+
+        start = time.time()
+        if self.inPlace: #an interrupted in-place search leaves its working state mid-move
+            gameState = gameState.deepCopy()
+        action = None
+        for depth in range(1, self.maxDepth + 1):
+            self.depth = depth
+            iterationStart = time.time()
+            try:
+                action = self.searchRoot(gameState, rootSearch)
+            except SearchTimeout:
+                break
+            self.completedDepth = depth
+            self.rootAction = action
+            now = time.time()
+            if start + self.timeLimit - now < now - iterationStart:
+                break #the next iteration would take at least as long as this one did
+            self.deadline = start + self.timeLimit
+
+        self.deadline = None
+        self.rootAction = None
+        return action
+
+    def searchRoot(self, gameState, rootSearch):
+        """
+        Returns rootSearch(gameState) for the current self.depth, deciding
+        first which ghosts the search branches on.  Also measures the
+        effective branching factor: the depth-th root of the number of
+        successors the (serial) search generated.
+        """
+        self.classifyGhosts(gameState)
+        nodes = self.nodes
+        action = rootSearch(gameState)
+        self.branchingFactor = (self.nodes - nodes) ** (1.0 / self.depth)
+        if self.irrelevantGhosts is not None:
+            self.relevanceSearches += 1
+            self.relevantGhosts += gameState.getNumAgents() - 1 - len(self.frozenGhosts | self.advancedGhosts)
+            self.branchingTotal += self.branchingFactor
+        return action
+
+    def classifyGhosts(self, gameState):
+        """
+        With irrelevantGhosts set, finds the ghosts further from Pacman (in
+        maze steps) than relevanceRadius, which defaults to twice the depth:
+        as Pacman and a ghost each move once per ply, those cannot collide
+        within the search.  The search freezes or advances them.
+        """
+        if self.irrelevantGhosts is None:
+            return
+        radius = 2 * self.depth if self.relevanceRadius is None else self.relevanceRadius
+        pacmanPosition = gameState.getPacmanPosition()
+        irrelevant = frozenset(ghostIndex for ghostIndex in range(1, gameState.getNumAgents())
+                               if gameState.getMazeDistance(pacmanPosition,
+                                                            gameState.getGhostPosition(ghostIndex)) > radius)
+        if self.irrelevantGhosts == 'freeze':
+            self.frozenGhosts = irrelevant
+        else:
+            self.advancedGhosts = irrelevant
+
+    def nextAgent(self, state, agentIndex):
+        """
+        The agent that moves after `agentIndex` in the search, skipping
+        frozen ghosts.
+        """
+        numAgents = state.getNumAgents()
+        next_agent = (agentIndex + 1) % numAgents
+        while next_agent in self.frozenGhosts:
+            next_agent = (next_agent + 1) % numAgents
+        return next_agent
+
+    def advanceGhost(self, state, agentIndex):
+        """
+        The one move searched for an advanced ghost: towards Pacman, or away
+        from Pacman when scared, as a DirectionalGhost most likely moves.
+        """
+        actions = state.getLegalActions(agentIndex)
+        ghostState = state.getGhostState(agentIndex)
+        scared = ghostState.scaredTimer > 0
+        x, y = ghostState.getPosition()
+        pacmanPosition = state.getPacmanPosition()
+        def distance(action):
+            dx, dy = Actions.directionToVector(action, 0.5 if scared else 1)
+            d = state.getMazeDistance((x + dx, y + dy), pacmanPosition)
+            return -d if scared else d
+        return min(actions, key=distance)
+
+    def startPondering(self, gameState, action, rootSearch):
+        """
+        Starts searching, in a background thread, the states the game can
+        reach before Pacman's next move: `action` followed by each of the
+        ghosts' possible replies.  Results go to the transposition table.
+
+        The thread searches with a ponderer of its own (see ponderer), so
+        the depth and ghost classification of the agent's searches are
+        never touched from it.  The tables the two share belong to the
+        thread until stopPondering has joined it, which every search does
+        before it starts.
+        """
+        self.pondered = 0
+        if action is None:
+            return
+        successor = gameState.generateSuccessor(self.index, action)
+        ponderer = self.ponderer()
+        self.ponderStop = ponderer.ponderStop = threading.Event()
+        self.ponderThread = threading.Thread(target=self.ponderReplies,
+                                             args=(ponderer, successor, getattr(ponderer, rootSearch.__name__)))
+        self.ponderThread.daemon = True
+        self.ponderThread.start()
+
+    def ponderer(self):
+        """
+        A shallow copy of the agent to ponder with: it has its own depth,
+        ghost classification, deadline and counters, and shares the
+        transposition table (and any move ordering or ghost model) that
+        the pondered results are for.
+        """
+        ponderer = copy.copy(self) #__getstate__ leaves out the pool and the ponder thread
+        ponderer.depth = self.completedDepth
+        ponderer.deadline = None
+        ponderer.rootAction = None
+        ponderer.workers = 1
+        ponderer.ponder = False
+        ponderer.stats = None
+        ponderer.statsSink = None
+        return ponderer
+
+    def stopPondering(self):
+        if self.ponderThread is not None:
+            self.ponderStop.set()
+            self.ponderThread.join()
+            self.ponderThread = None
+            self.ponderStop = None
+
+    def ponderReplies(self, ponderer, state, rootSearch):
+        try:
+            for reply in ponderer.ghostReplies(state, 1):
+                if not (reply.isWin() or reply.isLose()):
+                    ponderer.classifyGhosts(reply)
+                    rootSearch(reply)
+                    self.pondered += 1
+        except SearchTimeout:
+            pass #getAction was called: the game has moved on
+
+    def ghostReplies(self, state, agentIndex):
+        """
+        Returns the states reached by every combination of moves of the
+        ghosts from `agentIndex` on that the search would consider.
+        """
+        if agentIndex == state.getNumAgents() or state.isWin() or state.isLose():
+            return [state]
+        replies = []
+        for action in self.ghostActions(state, agentIndex):
+            replies.extend(self.ghostReplies(state.generateSuccessor(agentIndex, action), agentIndex + 1))
+        return replies
+
+    def startPool(self, gameState):
+        """
+        Starts the worker processes, handing each one a copy of this agent
+        and the layout once, so states can be sent without their layout.
+        """
+        self.stopPool()
+        self.sharedAlpha = multiprocessing.Value('d', float('-inf'))
+        self.poolLayout = gameState.data.layout
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_initSearchWorker,
+            initargs=(self, self.poolLayout, self.sharedAlpha))
+
+    def stopPool(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    def searchRootInParallel(self, gameState):
+        """
+        Searches each of Pacman's root actions in a worker process and picks
+        the best one exactly as the serial search would.  When Pacman has
+        fewer actions than there are workers, the first ghost's replies are
+        split out as well.
+
+        Workers start from the best root value completed so far (the shared
+        alpha).  A subtree that cannot beat it comes back as an upper bound
+        below alpha and so never wins, while every value at or above alpha is
+        exact; the choice therefore does not depend on the number of workers
+        or the order in which they finish.
+        """
+        if self.pool is None or self.poolLayout is not gameState.data.layout:
+            self.startPool(gameState)
+        actions = self.orderActions(gameState, 1, self.index, gameState.getLegalActions(self.index))
+        splitGhosts = len(actions) < self.workers and self.nextAgent(gameState, self.index) == 1
+
+        paths = collections.OrderedDict() #pacman action -> paths searched by workers
+        successors = {}
+        for action in actions:
+            successor = successors[action] = gameState.generateSuccessor(self.index, action)
+            if splitGhosts and not (successor.isWin() or successor.isLose()):
+                paths[action] = [(action, ghostAction) for ghostAction in self.ghostActions(successor, 1)]
+            else:
+                paths[action] = [(action,)]
+
+        self.sharedAlpha.value = float('-inf')
+        shipped = copy.copy(gameState)
+        shipped.data = copy.copy(gameState.data)
+        shipped.data.layout = None #each worker already has it
+        futures = {}
+        for action in actions:
+            for path in paths[action]:
+                futures[self.pool.submit(_searchSubtree, shipped, path, self.depth, self.deadline)] = path
+
+        pathValues = {}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                path = futures[future]
+                pathValues[path] = future.result()
+                action = path[0]
+                if all(p in pathValues for p in paths[action]):
+                    v = self.root_value(successors[action], paths[action], pathValues)
+                    if v > self.sharedAlpha.value:
+                        self.sharedAlpha.value = v
+        except SearchTimeout:
+            for future in futures:
+                future.cancel()
+            raise
+
+        v, max_action = float('-inf'), None
+        for action in actions: #first strictly better action in root order, as in max_value
+            next_value = self.root_value(successors[action], paths[action], pathValues)
+            if next_value > v:
+                v, max_action = next_value, action
+        return max_action
+
+    def root_value(self, successor, paths, pathValues):
+        if len(paths[0]) == 1:
+            return pathValues[paths[0]]
+        return self.ghost_value(successor, [pathValues[path] for path in paths])
+
+    def ghostActions(self, state, agentIndex):
+        """
+        The actions of the ghost whose subtrees are searched, in order.
+        """
+        if agentIndex in self.advancedGhosts:
+            return [self.advanceGhost(state, agentIndex)]
+        return state.getLegalActions(agentIndex)
+
+    def ghost_value(self, state, values):
+        """
+        The value of a ghost node given the values of its children, in the
+        order of ghostActions.
+        """
+        return min(values)
+
+    def subtree_value(self, state, agentIndex, alpha):
+        """
+        The value of the first-ply state reached after `agentIndex` moved.
+        """
+        return self.value(state, 1, agentIndex)[0]
+
+    def checkTime(self):
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SearchTimeout()
+        if self.ponderStop is not None and self.ponderStop.is_set():
+            raise SearchTimeout()
+
+    def orderActions(self, state, depth, agentIndex, actions):
+        """
+        Returns the actions in the order they should be searched.  During
+        iterative deepening the root tries the previous iteration's best
+        action first; otherwise the order is left alone.
+        """
+        if depth == 1 and agentIndex == self.index and self.rootAction in actions:
+            actions.remove(self.rootAction)
+            actions.insert(0, self.rootAction)
+        return actions
+
+    def makeMove(self, state, depth, agentIndex, action):
+        """
+        Returns the state after `agentIndex` takes `action` at `depth`
+        together with an undo token.  In inPlace mode the working state
+        itself is advanced and the token must be handed to unmakeMove once
+        the subtree is searched; otherwise a new successor is generated and
+        the token is None.
+        """
+        self.nodes += 1
+        if self.stats is not None:
+            return self.timedMove(state, depth, agentIndex, action)
+        if self.inPlace:
+            return state, state.apply(agentIndex, action)
+        return state.generateSuccessor(agentIndex, action), None
+
+    def timedMove(self, state, depth, agentIndex, action):
+        stats = self.stats
+        stats.nodesByDepth[depth] += 1
+        stats.nodesByAgent[agentIndex] += 1
+        start = time.perf_counter()
+        if self.inPlace:
+            move = state, state.apply(agentIndex, action)
+        else:
+            move = state.generateSuccessor(agentIndex, action), None
+        stats.successorTime += time.perf_counter() - start
+        return move
+
+    def evaluate(self, state, terminal=False):
+        """
+        The evaluation of a leaf: a won or lost state if `terminal`, or a
+        state at the depth limit.
+        """
+        if self.stats is None:
+            return self.evaluationFunction(state)
+        start = time.perf_counter()
+        value = self.evaluationFunction(state)
+        self.stats.evaluationTime += time.perf_counter() - start
+        self.stats.evaluations += 1
+        if terminal:
+            self.stats.terminals += 1
+        return value
+
+    def unmakeMove(self, state, token):
+        if token is not None:
+            state.undo(token)
 
 class MinimaxAgent(MultiAgentSearchAgent):
     """
@@ -143,58 +929,97 @@ class MinimaxAgent(MultiAgentSearchAgent):
         Returns whether or not the game state is a losing state
         """
         "*** YOUR CODE HERE ***"
+        return self.search(gameState, self.search_root)
+
+    def search_root(self, gameState):
         _, action = self.max_value(gameState, 1, self.index) #run MAXIMIZER (set depth to 1 because `value` will give depth + 1)
         return action
 
     def value(self, state, depth, agentIndex):
         if(state.isWin() or state.isLose()): #check for terminal state
             #this fixes the bug of pacman being stuck
-            return self.evaluationFunction(state), None
+            return self.evaluate(state, True), None
 
-        next_agent = (agentIndex + 1) % state.getNumAgents() #cyclic index for next agent
+        next_agent = self.nextAgent(state, agentIndex) #cyclic index for next agent, skipping frozen ghosts
 
         if(next_agent == self.index): #next_agent = pacman
             if(self.depth == depth):  #terminal state, if next agent == pacman and depth = game depth
-                return self.evaluationFunction(state), None
+                return self.evaluate(state), None
 
             return self.max_value(state, depth + 1, next_agent) #run maximizer, every max node iterates depth by 1.
 
         return self.min_value(state, depth, next_agent) #min state, i.e. ghost(s), depth remains the same
 
     def max_value(self, state, depth, agentIndex):
+        entry = self.probe(state, depth, agentIndex)
+        if entry is not None: #already searched this node to the same depth
+            return entry[0], entry[2]
+
         v, max_action = float('-inf'), None #represent smallest maximum value
-        actions = state.getLegalActions(self.index) #get actions
+        self.checkTime()
+        actions = self.orderActions(state, depth, agentIndex, state.getLegalActions(self.index)) #get actions
 
         for action in actions:
-            successor = state.generateSuccessor(agentIndex, action) #get next states
+            successor, token = self.makeMove(state, depth, agentIndex, action) #get next states
             next_value = self.value(successor, depth, agentIndex)[0]
+            self.unmakeMove(state, token)
             if (next_value > v): #store the maximum action
                 max_action = action
             v = max(v, next_value)
+
+        self.record(state, depth, agentIndex, v, EXACT, max_action)
         return v, max_action #should return maximum possible value
 
     def min_value(self, state, depth, agentIndex):
+        entry = self.probe(state, depth, agentIndex)
+        if entry is not None:
+            return entry[0], entry[2]
+
         v, minimum_action = float('inf'), None #represent largest smallest value
-        actions = state.getLegalActions(agentIndex) #get action for a specific ghost
+        self.checkTime()
+        actions = self.ghostActions(state, agentIndex) #get action for a specific ghost
 
         for action in actions:
-            successor = state.generateSuccessor(agentIndex, action) #get next states
+            successor, token = self.makeMove(state, depth, agentIndex, action) #get next states
             next_value = self.value(successor, depth, agentIndex)[0]
+            self.unmakeMove(state, token)
             if (v > next_value): #store the minimum action
                 minimum_action = action
             v = min(v, next_value)
+
+        self.record(state, depth, agentIndex, v, EXACT, minimum_action)
         return v, minimum_action #should return minimum possible value along with minimum action
 
 class AlphaBetaAgent(MultiAgentSearchAgent):
     """
     Your minimax agent with alpha-beta pruning (question 3)
+
+    Pass ordering=MoveOrdering (or another class with the same methods) to
+    search the most promising actions first, which prunes more of the tree.
     """
 
+    def __init__(self, ordering = 'None', **args):
+        MultiAgentSearchAgent.__init__(self, **args)
+        self.moveOrdering = None if ordering == 'None' else util.lookup(ordering, globals())()
+        self.cutoffs = 0
+
+    def searchCounters(self):
+        counters = MultiAgentSearchAgent.searchCounters(self)
+        counters['cutoffs'] = self.cutoffs
+        if self.moveOrdering is not None:
+            counters['firstChildCutoffs'] = self.moveOrdering.firstChildCutoffs
+        return counters
+
     def getAction(self, gameState):
         """
         Returns the minimax action using self.depth and self.evaluationFunction
         """
         "*** YOUR CODE HERE ***"
+        return self.search(gameState, self.search_root)
+
+    def search_root(self, gameState):
+        if self.moveOrdering is not None:
+            self.moveOrdering.newSearch()
         prune = float('-inf'), float('inf') #alpha-beta initialization
         
         #run MAXIMIZER (set depth to 1 because `value` will give depth + 1)
@@ -206,62 +1031,166 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
 
         if(state.isWin() or state.isLose()): #check for terminal state
             #this fixes the bug of pacman being stuck
-            return self.evaluationFunction(state), None
+            return self.evaluate(state, True), None
         
-        next_agent = (agentIndex + 1) % state.getNumAgents() #cyclic index for next agent
+        next_agent = self.nextAgent(state, agentIndex) #cyclic index for next agent, skipping frozen ghosts
 
         if(next_agent == self.index): #pacman is next agent?
             if self.depth == depth: #terminal state when next_agent = pacman and depth = game_depth
-                return self.evaluationFunction(state), None #perform static evaluation
+                return self.evaluate(state), None #perform static evaluation
 
             return self.max_value(state, depth + 1, next_agent, prune) #use MAXIMIZER
         return self.min_value(state, depth, next_agent, prune) #use MINIMIZER
 
+    def subtree_value(self, state, agentIndex, alpha):
+        return self.value(state, 1, agentIndex, (alpha, float('inf')))[0]
+
+    def cached_value(self, state, depth, agentIndex, prune):
+        """
+        Returns the stored (value, action) for the node if the transposition
+        table holds an exact value, or a bound that already falls outside the
+        (alpha, beta) window.  Returns None otherwise.
+        """
+        entry = self.probe(state, depth, agentIndex)
+        if entry is None:
+            return None
+        value, bound, action = entry
+        alpha, beta = prune
+        if bound == EXACT or (bound == LOWERBOUND and value > beta) or (bound == UPPERBOUND and value < alpha):
+            return value, action
+        return None
+
+    def orderActions(self, state, depth, agentIndex, actions):
+        actions = MultiAgentSearchAgent.orderActions(self, state, depth, agentIndex, actions)
+        if self.moveOrdering is None:
+            return actions
+        hashAction = None
+        if self.transpositionTable is not None:
+            hashAction = self.transpositionTable.bestAction(state, self.depth - depth, agentIndex)
+        elif depth == 1:
+            hashAction = self.rootAction
+        return self.moveOrdering.order(state, depth, agentIndex, actions, hashAction)
+
+    def record_cutoff(self, state, depth, agentIndex, action, childIndex):
+        self.cutoffs += 1
+        if self.moveOrdering is not None:
+            self.moveOrdering.recordCutoff(state, depth, agentIndex, action, childIndex, self.depth - depth + 1)
+
+    def record_bounded(self, state, depth, agentIndex, prune, v, action):
+        #values strictly outside the window come from a cutoff and are only bounds
+        alpha, beta = prune
+        if v > beta:
+            bound = LOWERBOUND
+        elif v < alpha:
+            bound = UPPERBOUND
+        else:
+            bound = EXACT
+        self.record(state, depth, agentIndex, v, bound, action)
+
     def max_value(self, state, depth, agentIndex, prune):
+        cached = self.cached_value(state, depth, agentIndex, prune)
+        if cached is not None:
+            return cached
+
         alpha, beta = prune
         v, max_action = float('-inf'), None #represent smallest maximum value
-        actions = state.getLegalActions(self.index) #get actions
+        self.checkTime()
+        actions = self.orderActions(state, depth, agentIndex, state.getLegalActions(self.index)) #get actions
 
-        for action in actions:
-            successor = state.generateSuccessor(agentIndex, action) #get next states
+        for i, action in enumerate(actions):
+            successor, token = self.makeMove(state, depth, agentIndex, action) #get next states
             next_value = self.value(successor, depth, agentIndex, (alpha, beta))[0]
+            self.unmakeMove(state, token)
             if (next_value > v): #store the maximum action
                 max_action = action
 
             v = max(v, next_value)
 
             if(v > beta):
+                self.record_cutoff(state, depth, agentIndex, action, i)
+                self.record_bounded(state, depth, agentIndex, prune, v, max_action)
                 return v, max_action
 
             alpha = max(alpha, v)
 
+        self.record_bounded(state, depth, agentIndex, prune, v, max_action)
         return v, max_action #should return maximum possible value
 
     def min_value(self, state, depth, agentIndex, prune):
+        cached = self.cached_value(state, depth, agentIndex, prune)
+        if cached is not None:
+            return cached
+
         alpha, beta = prune
         v, minimum_action = float('inf'), None #represent largest smallest value
-        actions = state.getLegalActions(agentIndex) #get action for a specific ghost
+        self.checkTime()
+        actions = self.orderActions(state, depth, agentIndex, self.ghostActions(state, agentIndex)) #get action for a specific ghost
 
-        for action in actions:
-            successor = state.generateSuccessor(agentIndex, action) #get next states
+        for i, action in enumerate(actions):
+            successor, token = self.makeMove(state, depth, agentIndex, action) #get next states
             next_value = self.value(successor, depth, agentIndex, (alpha, beta))[0]
+            self.unmakeMove(state, token)
             if (v > next_value): #store the minimum action
                 minimum_action = action
             
             v = min(v, next_value)
             
             if(v < alpha):
+                self.record_cutoff(state, depth, agentIndex, action, i)
+                self.record_bounded(state, depth, agentIndex, prune, v, minimum_action)
                 return v, minimum_action
             
             beta = min(beta, v)
             
+        self.record_bounded(state, depth, agentIndex, prune, v, minimum_action)
         return v, minimum_action #should return minimum possible value along with minimum action
 
 class ExpectimaxAgent(MultiAgentSearchAgent):
     """
       Your expectimax agent (question 4)
+
+    Pass star=1 or star=2 to prune chance nodes with Ballard's Star1 or Star2
+    algorithm, which needs bounds on the values of the evaluation function.
+    They come from boundsFn, called as boundsFn(state, pacmanMoves,
+    ghostMoves) for the values reachable within that many moves; the default,
+    scoreBounds, suits scoreEvaluationFunction.  Alternatively declare fixed
+    bounds with lowerBound and upperBound, which are offsets from the root's
+    score unless relativeBounds=False.  starCheck=True also runs the full
+    search and checks that both choose the same action; with report=True
+    the successors saved are printed when the game ends.
+
+    Ghosts are uniformly random unless ghostModel names a GhostAgent class
+    (e.g. DirectionalGhost or ghostAgents.RandomGhost) or a GhostModel
+    subclass, whose probabilities then weight the chance nodes.  Ghost
+    actions less likely than ghostThreshold are not searched, and up to
+    modelSize distributions are memoized.
     """
 
+    def __init__(self, star = '0', boundsFn = 'scoreBounds', lowerBound = 'None', upperBound = 'None',
+                 relativeBounds = 'True', starCheck = 'False', ghostModel = 'None', ghostThreshold = '0',
+                 modelSize = '100000', **args):
+        MultiAgentSearchAgent.__init__(self, **args)
+        self.ghostModel = None #None models the ghosts as uniformly random
+        if ghostModel != 'None':
+            model = util.lookup(ghostModel, globals())
+            if isinstance(model, type) and issubclass(model, GhostModel):
+                self.ghostModel = model(threshold=float(ghostThreshold), capacity=int(modelSize))
+            else:
+                self.ghostModel = GhostModel(model, float(ghostThreshold), int(modelSize))
+        self.star = int(star)
+        if self.star not in (0, 1, 2):
+            raise Exception('star must be 0, 1 or 2')
+        self.boundsFunction = util.lookup(boundsFn, globals())
+        self.bounds = None #fixed bounds, used instead of boundsFn when declared
+        if 'None' not in (lowerBound, upperBound):
+            self.bounds = float(lowerBound), float(upperBound)
+        self.relativeBounds = isTrue(relativeBounds)
+        self.starCheck = isTrue(starCheck)
+        self.offset = 0 #what fixed bounds are relative to in the current search
+        self.starCutoffs = 0
+        self.starNodes = 0 #successors generated by star searches that were checked
+        self.fullNodes = 0 #successors the full searches generated for the same roots
+
     def getAction(self, gameState):
         """
         Returns the expectimax action using self.depth and self.evaluationFunction
@@ -270,52 +1199,642 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         legal moves.
         """
         "*** YOUR CODE HERE ***"
+        return self.search(gameState, self.search_root)
+
+    def registerInitialState(self, gameState):
+        MultiAgentSearchAgent.registerInitialState(self, gameState)
+        if self.ghostModel is not None:
+            self.ghostModel.clear() #distributions depend on the layout's walls
+        self.starCutoffs = 0 #the Star summary covers one game
+        self.starNodes = 0
+        self.fullNodes = 0
+
+    def searchCounters(self):
+        counters = MultiAgentSearchAgent.searchCounters(self)
+        counters['cutoffs'] = self.starCutoffs
+        if self.ghostModel is not None:
+            counters['ghostModelHits'] = self.ghostModel.hits
+            counters['ghostModelMisses'] = self.ghostModel.misses
+            counters['ghostModelPruned'] = self.ghostModel.pruned
+        return counters
+
+    def search_root(self, gameState):
+        if self.star:
+            return self.star_root(gameState)
         _, action = self.max_value(gameState, 1, 0)
         return action
 
+    def final(self, gameState):
+        MultiAgentSearchAgent.final(self, gameState)
+        if self.report and self.starCheck and self.fullNodes:
+            saved = self.fullNodes - self.starNodes
+            print('Star%d pruning: %d of %d successors saved (%.1f%%), %d cutoffs' %
+                  (self.star, saved, self.fullNodes, 100.0 * saved / self.fullNodes, self.starCutoffs))
+
+    def chance_distribution(self, state, agentIndex):
+        """
+        The (action, probability) pairs of a chance node, from the ghost
+        model or uniform over the ghost's legal actions.
+        """
+        if agentIndex in self.advancedGhosts:
+            return [(self.advanceGhost(state, agentIndex), 1.0)]
+        if self.ghostModel is not None:
+            return self.ghostModel.getDistribution(state, agentIndex)
+        actions = state.getLegalActions(agentIndex) #get action for a specific ghost
+        uniform_expectation = 1/len(actions) #since expectimax in this project follows uniform dist, each probability is equal.
+        return [(action, uniform_expectation) for action in actions]
+
+    def ghostActions(self, state, agentIndex):
+        return [action for action, _ in self.chance_distribution(state, agentIndex)]
+
+    def ghost_value(self, state, values):
+        expected_value = 0 #summed in the same order as min_value, so results match the serial search
+        for (_, probability), next_value in zip(self.chance_distribution(state, 1), values):
+            expected_value += probability * next_value
+        return expected_value
+
     def value(self, state, depth, agentIndex):
         if(state.isWin() or state.isLose()): #check for terminal state
             #this fixes the bug of pacman being stuck
-            return self.evaluationFunction(state), None
+            return self.evaluate(state, True), None
 
-        next_agent = (agentIndex + 1) % state.getNumAgents() #cyclic index for next agent
+        next_agent = self.nextAgent(state, agentIndex) #cyclic index for next agent, skipping frozen ghosts
 
         if(next_agent == self.index): #next_agent = pacman
             if(self.depth == depth):  #terminal state, if next agent == pacman and depth = game depth
-                return self.evaluationFunction(state), None
+                return self.evaluate(state), None
 
             return self.max_value(state, depth + 1, next_agent) #run maximizer, every max node iterates depth by 1.
 
         return self.min_value(state, depth, next_agent) #min state, i.e. ghost(s), depth remains the same
     
     def max_value(self, state, depth, agentIndex):
+        entry = self.probe(state, depth, agentIndex)
+        if entry is not None:
+            return entry[0], entry[2]
+
         v, max_action = float('-inf'), None #represent smallest maximum value
-        actions = state.getLegalActions(self.index) #get actions
+        self.checkTime()
+        actions = self.orderActions(state, depth, agentIndex, state.getLegalActions(self.index)) #get actions
         for action in actions:
-            successor = state.generateSuccessor(agentIndex, action) #get next states
+            successor, token = self.makeMove(state, depth, agentIndex, action) #get next states
             next_value = self.value(successor, depth, agentIndex)[0]
+            self.unmakeMove(state, token)
             if (next_value > v): #store the maximum action
                 max_action = action
             v = max(v, next_value)
 
+        self.record(state, depth, agentIndex, v, EXACT, max_action)
         return v, max_action #should return maximum possible value
 
     def min_value(self, state, depth, agentIndex):
+        entry = self.probe(state, depth, agentIndex)
+        if entry is not None:
+            return entry[0], entry[2]
+
         v, minimum_action = float('inf'), None #represent largest smallest value
-        actions = state.getLegalActions(agentIndex) #get action for a specific ghost
-        uniform_expectation = 1/len(actions) #since expectimax in this project follows uniform dist, each probability is equal.
+        self.checkTime()
         expected_value = 0 #expected value 
 
-        for action in actions:
-            successor = state.generateSuccessor(agentIndex, action) #get next states
+        for action, probability in self.chance_distribution(state, agentIndex):
+            successor, token = self.makeMove(state, depth, agentIndex, action) #get next states
             next_value = self.value(successor, depth, agentIndex)[0]
+            self.unmakeMove(state, token)
             if (v > expected_value): #store the minimum action
                 minimum_action = action
 
-            expected_value +=  uniform_expectation * next_value #calculate the expectation
+            expected_value +=  probability * next_value #calculate the expectation
 
+        self.record(state, depth, agentIndex, expected_value, EXACT, minimum_action)
         return expected_value, minimum_action #should return minimum possible value along with minimum action
 
+    def star_root(self, gameState):
+        self.offset = gameState.getScore() if self.relativeBounds else 0
+        window = float('-inf'), float('inf')
+        if not self.starCheck:
+            return self.star_max(gameState, 1, self.index, window)[1]
+
+        #count successors generated by both searches (makeMove counts in both modes), and make sure they agree
+        nodes = self.nodes
+        action = self.star_max(gameState, 1, self.index, window)[1]
+        starNodes = self.nodes - nodes
+        fullAction = self.max_value(gameState, 1, self.index)[1]
+        if action != fullAction:
+            raise Exception('Star%d pruning chose %s where the full search chose %s' % (self.star, action, fullAction))
+        self.starNodes += starNodes
+        self.fullNodes += self.nodes - nodes - starNodes
+        return action
+
+    def star_bounds(self, state, pacmanMoves, ghostMoves):
+        """
+        Bounds on the value of every leaf within the given numbers of moves
+        of `state`.
+        """
+        if self.bounds is not None:
+            return self.offset + self.bounds[0], self.offset + self.bounds[1]
+        return self.boundsFunction(state, pacmanMoves, ghostMoves)
+
+    def star_evaluate(self, state, terminal=False):
+        value = self.evaluate(state, terminal)
+        low, high = self.star_bounds(state, 0, 0)
+        if not low <= value <= high: #pruning would no longer be safe
+            raise Exception('Evaluation %s is outside the declared bounds [%s, %s]' % (value, low, high))
+        return value
+
+    def star_value(self, state, depth, agentIndex, prune, probed=None):
+        if(state.isWin() or state.isLose()): #check for terminal state
+            return self.star_evaluate(state, True), None
+
+        next_agent = self.nextAgent(state, agentIndex) #cyclic index for next agent, skipping frozen ghosts
+
+        if(next_agent == self.index): #next_agent = pacman
+            if(self.depth == depth):  #terminal state, if next agent == pacman and depth = game depth
+                return self.star_evaluate(state), None
+
+            return self.star_max(state, depth + 1, next_agent, prune, probed)
+
+        return self.star_chance(state, depth, next_agent, prune)
+
+    def star_max(self, state, depth, agentIndex, prune, probed=None):
+        """
+        A max node searched within the (alpha, beta) window: values at or
+        below alpha are upper bounds and values at or above beta are lower
+        bounds; those in between are exact.  `probed` is an (action, exact
+        value) pair already found by a Star2 probe, which is not searched again.
+        """
+        alpha, beta = prune
+        v, max_action = float('-inf'), None
+        self.checkTime()
+        actions = self.orderActions(state, depth, agentIndex, state.getLegalActions(self.index))
+        for action in actions:
+            if probed is not None and probed[0] == action:
+                next_value = probed[1]
+            else:
+                successor, token = self.makeMove(state, depth, agentIndex, action)
+                next_value = self.star_value(successor, depth, agentIndex, (alpha, beta))[0]
+                self.unmakeMove(state, token)
+            if (next_value > v):
+                max_action = action
+            v = max(v, next_value)
+            if v >= beta:
+                return v, max_action
+            alpha = max(alpha, v)
+        return v, max_action
+
+    def star_chance(self, state, depth, agentIndex, prune):
+        """
+        A chance node searched within the (alpha, beta) window.  The
+        children not searched yet are assumed to be as bad (low) or as
+        good (high) as possible, which narrows the window each child is
+        searched with; once the expectation is sure to fall outside
+        (alpha, beta), the remaining children are skipped (Star1).  Star2
+        first probes one Pacman action below each child, since those are
+        max nodes, to raise the assumed worst case above low.  The bounds
+        come from star_bounds for this node and hold for all its children.
+        """
+        alpha, beta = prune
+        self.checkTime()
+        distribution = self.chance_distribution(state, agentIndex)
+        actions = [action for action, _ in distribution]
+        probabilities = [probability for _, probability in distribution]
+        numAgents = state.getNumAgents()
+        pacmanMoves = self.depth - depth
+        low, high = self.star_bounds(state, pacmanMoves, numAgents - agentIndex + pacmanMoves * (numAgents - 1))
+        lower = [low] * len(actions) #lower bounds on the children's values
+        probes = [None] * len(actions) #exact values found by probing
+
+        next_agent = self.nextAgent(state, agentIndex)
+        if self.star == 2 and next_agent == self.index and depth < self.depth:
+            for i, action in enumerate(actions):
+                successor, token = self.makeMove(state, depth, agentIndex, action)
+                rest = sum(p * bound for j, (p, bound) in enumerate(zip(probabilities, lower)) if j != i)
+                child_beta = (beta - rest) / probabilities[i]
+                lower[i], probes[i] = self.star_probe(successor, depth, agentIndex, (low, child_beta))
+                self.unmakeMove(state, token)
+                if lower[i] >= child_beta:
+                    self.starCutoffs += 1
+                    return rest + probabilities[i] * lower[i], None
+
+        expected_value = 0 #summed exactly as min_value does, so exact values match the full search
+        for i, action in enumerate(actions):
+            probability = probabilities[i]
+            rest_high = high * sum(probabilities[i + 1:])
+            rest_low = sum(p * bound for p, bound in zip(probabilities[i + 1:], lower[i + 1:]))
+            child_alpha = (alpha - expected_value - rest_high) / probability
+            child_beta = (beta - expected_value - rest_low) / probability
+            successor, token = self.makeMove(state, depth, agentIndex, action)
+            next_value = self.star_value(successor, depth, agentIndex,
+                                         (max(child_alpha, low), min(child_beta, high)), probes[i])[0]
+            self.unmakeMove(state, token)
+            if next_value <= child_alpha:
+                self.starCutoffs += 1
+                return expected_value + probability * next_value + rest_high, None
+            if next_value >= child_beta:
+                self.starCutoffs += 1
+                return expected_value + probability * next_value + rest_low, None
+            expected_value +=  probability * next_value
+
+        return expected_value, None
+
+    def star_probe(self, state, depth, agentIndex, prune):
+        """
+        A lower bound on the value of `state`, reached after the last ghost
+        moved: its exact value if it is a leaf, or else the value of Pacman's
+        first action from it, searched within the (low, beta) window.  Also
+        returns that first action and its value when the value is exact, so
+        the full search of `state` can skip it.
+        """
+        low, beta = prune
+        if state.isWin() or state.isLose() or self.depth == depth:
+            return self.star_value(state, depth, agentIndex, prune)[0], None
+        actions = self.orderActions(state, depth + 1, self.index, state.getLegalActions(self.index))
+        successor, token = self.makeMove(state, depth + 1, self.index, actions[0])
+        value = self.star_value(successor, depth + 1, self.index, prune)[0]
+        self.unmakeMove(state, token)
+        probed = (actions[0], value) if low < value < beta else None
+        return max(value, low), probed
+
+class MCTSNode:
+    """
+    A node of an MCTSAgent's search tree: a state with Pacman to move.
+
+    Pacman's actions are the edges.  The ghosts' replies are sampled, so an
+    action can lead to several children, kept by the state they reach.  Each
+    action carries its visit count and the sum of the values backed up
+    through it.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.terminal = state.isWin() or state.isLose()
+        self.actions = [] if self.terminal else state.getLegalActions(0)
+        self.untried = self.actions[:]
+        random.shuffle(self.untried)
+        self.visits = 0
+        self.actionVisits = dict([(action, 0) for action in self.actions])
+        self.actionValues = dict([(action, 0.0) for action in self.actions])
+        self.children = {} #action -> {state: MCTSNode}
+
+    def child(self, action, state):
+        return self.children.get(action, {}).get(state)
+
+class MCTSAgent(Agent):
+    """
+    A Monte Carlo Tree Search agent that uses GameState as its simulator.
+
+    Each simulation descends the tree choosing Pacman's actions by UCT and
+    sampling the ghosts' replies from the ghost policy, adds one node, plays
+    a rollout of up to rolloutDepth Pacman moves from it and backs up the
+    evaluation of where the rollout ended.  The most visited root action is
+    played.
+
+    Options (-a key=value):
+      budget        simulations per move, 0 for no limit (default 200)
+      timeLimit     seconds per move, 0 for no limit (default 0)
+      rolloutDepth  Pacman moves per rollout (default 5)
+      exploration   the UCT exploration constant (default 1.0)
+      pacmanPolicy  'greedy' (default) or 'random' Pacman in rollouts
+      ghostPolicy   'random' (default) or 'directional' ghosts
+      reuse         keep the subtree of the move played (default True)
+      workers       processes searching independent trees from the root,
+                    whose root statistics are summed (default 1)
+    """
+
+    def __init__(self, evalFn = 'scoreEvaluationFunction', budget = '200', timeLimit = '0', rolloutDepth = '5',
+                 exploration = '1.0', pacmanPolicy = 'greedy', ghostPolicy = 'random', reuse = 'True', workers = '1'):
+        self.index = 0 # Pacman is always agent index 0
+        self.evaluationFunction = util.lookup(evalFn, globals())
+        self.budget = int(budget)
+        self.timeLimit = float(timeLimit)
+        if self.budget <= 0 and self.timeLimit <= 0:
+            raise Exception('MCTSAgent needs a budget or a timeLimit')
+        self.rolloutDepth = int(rolloutDepth)
+        self.exploration = float(exploration)
+        if pacmanPolicy not in ('greedy', 'random'):
+            raise Exception('Unknown pacmanPolicy: ' + pacmanPolicy)
+        if ghostPolicy not in ('random', 'directional'):
+            raise Exception('Unknown ghostPolicy: ' + ghostPolicy)
+        self.pacmanPolicy = pacmanPolicy
+        self.ghostPolicy = ghostPolicy
+        self.ghostModels = {}
+        self.reuse = isTrue(reuse)
+        self.workers = int(workers)
+        self.pool = None
+        self.poolLayout = None
+        self.root = None #tree of the previous move, for reuse
+        self.lastAction = None
+        self.low, self.high = float('inf'), float('-inf') #range of backed-up values, for normalizing
+        self.simulations = 0 #simulations run for the last move, in this process
+        self.reusedVisits = 0 #visits inherited from the previous move's tree
+        self.statsSink = None #set by pacman.py --searchStats
+        self.games = 0
+        self.moves = 0
+
+    def registerInitialState(self, gameState):
+        self.root = None
+        self.low, self.high = float('inf'), float('-inf')
+        self.games += 1
+        self.moves = 0
+        if self.workers > 1:
+            self.startPool(gameState)
+
+    def final(self, gameState):
+        self.stopPool()
+
+    def __getstate__(self):
+        #the pool and the tree stay with the agent that owns them
+        state = self.__dict__.copy()
+        state['pool'] = None
+        state['root'] = None
+        return state
+
+    def collectSearchStats(self, sink):
+        """
+        Sends a SearchStats record of every following getAction, with the
+        simulations run in this process and the visits reused, to
+        sink.write.
+        """
+        self.statsSink = sink
+
+    def startPool(self, gameState):
+        self.stopPool()
+        self.poolLayout = gameState.data.layout
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers - 1, initializer=_initSearchWorker,
+            initargs=(self, self.poolLayout, None))
+
+    def stopPool(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    def getAction(self, gameState):
+        start = time.time()
+        deadline = start + self.timeLimit if self.timeLimit > 0 else None
+        root = self.find_root(gameState)
+
+        futures = []
+        if self.workers > 1:
+            if self.pool is None or self.poolLayout is not gameState.data.layout:
+                self.startPool(gameState)
+            shipped = copy.copy(gameState)
+            shipped.data = copy.copy(gameState.data)
+            shipped.data.layout = None #each worker already has it
+            futures = [self.pool.submit(_searchTree, shipped, self.budget, deadline, random.randrange(2 ** 31))
+                       for i in range(self.workers - 1)]
+
+        self.simulations = self.run(root, self.budget, deadline)
+        visits = dict(root.actionVisits)
+        values = dict(root.actionValues)
+        for future in futures: #the trees searched by the workers vote too
+            for action, (actionVisits, actionValue) in future.result().items():
+                visits[action] += actionVisits
+                values[action] += actionValue
+
+        action = max(root.actions, key=lambda a: (visits[a], values[a] / visits[a] if visits[a] else float('-inf')))
+        self.root, self.lastAction = root, action
+        self.moves += 1
+        if self.statsSink is not None:
+            stats = SearchStats(self.__class__.__name__, self.games, self.moves)
+            stats.wallTime = time.time() - start
+            stats.counters = {'simulations': self.simulations, 'reusedVisits': self.reusedVisits}
+            self.statsSink.write(stats)
+        return action
+
+    def find_root(self, gameState):
+        """
+        Returns the node of the previous move's tree that the game actually
+        reached, or a new node if it was never sampled (or reuse is off).
+        """
+        self.reusedVisits = 0
+        if self.reuse and self.root is not None:
+            node = self.root.child(self.lastAction, gameState)
+            if node is not None:
+                self.reusedVisits = node.visits
+                return node
+        return MCTSNode(gameState)
+
+    def run(self, root, budget, deadline):
+        """
+        Runs simulations from root until the budget or the deadline runs
+        out, and returns how many were run.
+        """
+        simulations = 0
+        while budget <= 0 or simulations < budget:
+            if deadline is not None and time.time() > deadline:
+                break
+            self.simulate(root)
+            simulations += 1
+        return simulations
+
+    def simulate(self, root):
+        node, path = root, []
+        while True:
+            if node.terminal:
+                value = self.evaluationFunction(node.state)
+                break
+            action = node.untried.pop() if node.untried else self.select(node)
+            state = self.play_ghosts(node.state.generateSuccessor(self.index, action))
+            path.append((node, action))
+            child = node.child(action, state)
+            if child is None: #expand: add the new node and roll out from it
+                node.children.setdefault(action, {})[state] = MCTSNode(state)
+                value = self.rollout(state)
+                break
+            node = child
+
+        self.low, self.high = min(self.low, value), max(self.high, value)
+        for node, action in path:
+            node.visits += 1
+            node.actionVisits[action] += 1
+            node.actionValues[action] += value
+
+    def select(self, node):
+        """
+        UCT: the action with the best mean value, normalized to [0, 1] by
+        the range of values seen so far, plus an exploration bonus.
+        """
+        logVisits = math.log(node.visits)
+        spread = self.high - self.low if self.high > self.low else 1.0
+        def uct(action):
+            visits = node.actionVisits[action]
+            mean = (node.actionValues[action] / visits - self.low) / spread
+            return mean + self.exploration * math.sqrt(logVisits / visits)
+        return max(node.actions, key=uct)
+
+    def play_ghosts(self, state):
+        """
+        Plays every ghost's move after Pacman's, drawn from the ghost policy.
+        """
+        for ghostIndex in range(1, state.getNumAgents()):
+            if state.isWin() or state.isLose():
+                break
+            state = state.generateSuccessor(ghostIndex, self.ghost_action(state, ghostIndex))
+        return state
+
+    def ghost_action(self, state, ghostIndex):
+        if self.ghostPolicy == 'random':
+            return random.choice(state.getLegalActions(ghostIndex))
+        if ghostIndex not in self.ghostModels:
+            self.ghostModels[ghostIndex] = DirectionalGhost(ghostIndex)
+        return self.ghostModels[ghostIndex].getAction(state)
+
+    def rollout(self, state):
+        for i in range(self.rolloutDepth):
+            if state.isWin() or state.isLose():
+                break
+            state = self.play_ghosts(state.generateSuccessor(self.index, self.pacman_action(state)))
+        return self.evaluationFunction(state)
+
+    def pacman_action(self, state):
+        """
+        The rollout policy for Pacman.  Greedy Pacman keeps moving, prefers
+        food and capsules and avoids squares next to a dangerous ghost,
+        breaking ties at random.
+        """
+        actions = state.getLegalActions(self.index)
+        if self.pacmanPolicy == 'random':
+            return random.choice(actions)
+        position = state.getPacmanPosition()
+        food, capsules = state.getFood(), state.getCapsules()
+        ghosts = [ghost.getPosition() for ghost in state.getGhostStates() if ghost.scaredTimer == 0]
+        best, bestActions = None, []
+        for action in actions:
+            if action == Directions.STOP:
+                continue
+            x, y = Actions.getSuccessor(position, action)
+            x, y = int(x), int(y)
+            score = 1 if food[x][y] or (x, y) in capsules else 0
+            if any(manhattanDistance((x, y), ghost) <= 1 for ghost in ghosts):
+                score -= 2
+            if best is None or score > best:
+                best, bestActions = score, [action]
+            elif score == best:
+                bestActions.append(action)
+        return random.choice(bestActions or actions)
+
+# State of a worker process in a MultiAgentSearchAgent's pool
+_workerAgent = None
+_workerLayout = None
+_workerAlpha = None
+
+def _initSearchWorker(agent, layout, sharedAlpha):
+    global _workerAgent, _workerLayout, _workerAlpha
+    _workerAgent = agent
+    _workerAgent.workers = 1
+    _workerLayout = layout
+    _workerAlpha = sharedAlpha
+
+def _searchSubtree(state, path, depth, deadline):
+    """
+    Runs in a worker: plays the actions in `path` (Pacman's, then possibly
+    the first ghost's) from the root state and returns the value of the
+    resulting node.
+    """
+    state.data.layout = _workerLayout
+    _workerAgent.depth = depth
+    _workerAgent.deadline = deadline
+    _workerAgent.classifyGhosts(state)
+    for agentIndex, action in enumerate(path):
+        state = state.generateSuccessor(agentIndex, action)
+    return _workerAgent.subtree_value(state, len(path) - 1, _workerAlpha.value)
+
+def _searchTree(state, budget, deadline, seed):
+    """
+    Runs in a worker: searches a fresh MCTS tree from the root state and
+    returns its root statistics, {action: (visits, total value)}.
+    """
+    state.data.layout = _workerLayout
+    random.seed(seed)
+    root = MCTSNode(state)
+    _workerAgent.run(root, budget, deadline)
+    return dict([(action, (root.actionVisits[action], root.actionValues[action])) for action in root.actions])
+
+class FeatureCache:
+    """
+    One feature of an evaluation function, cached.  `key(state)` picks out
+    the part of the state the feature depends on, e.g. Pacman's position and
+    the food, and `compute(state)` the feature's value; values are memoized
+    per key in a bounded table that evicts the least recently used entry.
+    Calling the FeatureCache on a state returns the value.
+
+    Every FeatureCache is listed in FEATURE_CACHES, for featureCacheStats.
+    """
+
+    def __init__(self, name, key, compute, capacity=50000):
+        self.name = name
+        self.key = key
+        self.compute = compute
+        self.capacity = capacity
+        self.values = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        FEATURE_CACHES.append(self)
+
+    def __call__(self, state):
+        key = self.key(state)
+        values = self.values
+        if key in values:
+            values.move_to_end(key)
+            self.hits += 1
+            return values[key]
+        self.misses += 1
+        value = values[key] = self.compute(state)
+        if len(values) > self.capacity:
+            values.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def clear(self):
+        self.values.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def hitRate(self):
+        probes = self.hits + self.misses
+        return float(self.hits) / probes if probes else 0.0
+
+    def __len__(self):
+        return len(self.values)
+
+FEATURE_CACHES = []
+
+def featureCacheStats():
+    """
+    Returns {name: (hits, misses, hit rate)} for every FeatureCache.
+    """
+    return dict((cache.name, (cache.hits, cache.misses, cache.hitRate())) for cache in FEATURE_CACHES)
+
+def foodKey(food):
+    # A BitGrid is identified by its bits (whose layout depends on the height); other Grids by their cells
+    bits = getattr(food, 'bits', None)
+    return (food.height, bits) if bits is not None else tuple(food.asList())
+
+def pacmanAndFood(state):
+    return state.getPacmanPosition(), foodKey(state.getFood())
+
+def pacmanAndGhosts(state):
+    return state.getPacmanPosition(), tuple(state.getGhostPositions())
+
+def sumOfFoodDistances(state):
+    """
+    The sum of the Manhattan distances from Pacman to every pellet, or 0.1
+    when none are left.
+    """
+    newPos = state.getPacmanPosition()
+    newFood = state.getFood().asList()
+    return sum([manhattanDistance(newPos, food) for food in newFood]) if newFood else 1e-1
+
+def ghostManhattanDistances(state):
+    """
+    The Manhattan distance from Pacman to each ghost, in ghost order.
+    """
+    newPos = state.getPacmanPosition()
+    return tuple([manhattanDistance(newPos, ghostPosition) for ghostPosition in state.getGhostPositions()])
+
+foodDistance = FeatureCache('foodDistance', pacmanAndFood, sumOfFoodDistances)
+ghostDistances = FeatureCache('ghostDistances', pacmanAndGhosts, ghostManhattanDistances)
+
 def betterEvaluationFunction(currentGameState):
     """
     Your extreme ghost-hunting, pellet-nabbing, food-gobbling, unstoppable
@@ -347,17 +1866,13 @@ def betterEvaluationFunction(currentGameState):
 
     """
     "*** YOUR CODE HERE ***"
-    # Useful information you can extract from a GameState (pacman.py)
-    newPos = currentGameState.getPacmanPosition()
-    newFood = currentGameState.getFood().asList()
-    newGhostStates = currentGameState.getGhostStates()
-
     #the farther the ghost from pacman, the higher the score should be.
     #the closer the food from pacman, the higher the score should be.
     #evaluationFunction = current_score * ∑(distance_to_ghost/(total_distance_to_food^2)) + 0.1 (bias)
+    #many leaves of a search share Pacman's position and the food, so the distances are cached features
 
-    dist_ghost = [manhattanDistance(newPos, ghostState.getPosition()) for ghostState in newGhostStates]
-    food_distance = sum([manhattanDistance(newPos, food) for food in newFood]) if newFood else 1e-1       
+    dist_ghost = ghostDistances(currentGameState)
+    food_distance = foodDistance(currentGameState)
     food_ghost = sum([x/(food_distance**2) for x in dist_ghost]) + 1e-1
 
     return currentGameState.getScore() * food_ghost
@@ -185,9 +185,9 @@ class GradingAgent(Agent):
         random.seed(self.seed)
 
     def getAction(self, state):
-        GameState.getAndResetExplored()
-        studentAction = (self.studentAgent.getAction(state),
-                         len(GameState.getAndResetExplored()))
+        with GameState.trackExplored('set') as explored:
+            studentAction = self.studentAgent.getAction(state)
+        studentAction = (studentAction, len(explored))
         optimalActions = self.optimalActions[self.stepCount]
         altDepthActions = self.altDepthActions[self.stepCount]
         partialPlyBugActions = self.partialPlyBugActions[self.stepCount]
@@ -295,11 +295,11 @@ class PolyAgent(Agent):
 
     def getAction(self, state):
         # survey agents
-        GameState.getAndResetExplored()
         optimalActionLists = []
         for agent in self.solutionAgents:
-            optimalActionLists.append((agent.getBestPacmanActions(
-                state)[0], len(GameState.getAndResetExplored())))
+            with GameState.trackExplored('set') as explored:
+                action = agent.getBestPacmanActions(state)[0]
+            optimalActionLists.append((action, len(explored)))
         alternativeDepthLists = [agent.getBestPacmanActions(
             state)[0] for agent in self.alternativeDepthAgents]
         partialPlyBugLists = [agent.getBestPacmanActions(
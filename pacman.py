@@ -41,6 +41,7 @@ The keys are 'a', 's', 'd', and 'w' to move (or arrow keys).  Have fun!
 """
 from game import GameStateData
 from game import Game
+from game import Configuration
 from game import Directions
 from game import Actions
 from util import nearestPoint
@@ -52,6 +53,37 @@ import types
 import time
 import random
 import os
+import contextlib
+
+class ExploredTracker:
+    """
+    Records the states expanded by GameState.generateSuccessor while it is
+    installed as GameState.tracker.  The mode is either 'count', which only
+    counts expansions, or 'set', which keeps the distinct states themselves
+    at the cost of hashing each one.
+    """
+
+    def __init__(self, mode='set'):
+        if mode not in ('count', 'set'):
+            raise ValueError('Unknown explored tracking mode: %r' % (mode,))
+        self.mode = mode
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.states = set()
+
+    def record(self, state, successor):
+        self.count += 1
+        if self.mode == 'set':
+            self.states.add(state)
+            self.states.add(successor)
+
+    def __len__(self):
+        if self.mode == 'set':
+            return len(self.states)
+        return self.count
+
 
 ###################################################
 # YOUR INTERFACE TO THE PACMAN WORLD: A GameState #
@@ -72,17 +104,48 @@ class GameState:
 
     Note that in classic Pacman, Pacman is always agent 0.
     """
+    __slots__ = ('data',)
 
     ####################################################
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
-    explored = set()
+    # static variable holding the ExploredTracker that generateSuccessor reports
+    # to; None (the default) means expanded states are not tracked at all
+    tracker = None
+
+    def trackExplored(mode='set'):
+        """
+        Tracks the states expanded by generateSuccessor for the duration of a
+        with block, and yields the ExploredTracker doing the recording:
+
+          with GameState.trackExplored('count') as explored:
+              agent.getAction(state)
+          print(len(explored))
+
+        In 'count' mode only the number of generateSuccessor calls is kept;
+        in 'set' mode every parent and successor state is kept, so len gives
+        the exact number of distinct states.  The previous tracker, if any,
+        is restored when the block exits.
+        """
+        previous = GameState.tracker
+        GameState.tracker = ExploredTracker(mode)
+        try:
+            yield GameState.tracker
+        finally:
+            GameState.tracker = previous
+    trackExplored = staticmethod(contextlib.contextmanager(trackExplored))
 
     def getAndResetExplored():
-        tmp = GameState.explored.copy()
-        GameState.explored = set()
+        """
+        Returns the states recorded by the current tracker and clears it.  An
+        empty set is returned when tracking is off or only counting.
+        """
+        tracker = GameState.tracker
+        if tracker is None:
+            return set()
+        tmp = tracker.states
+        tracker.reset()
         return tmp
     getAndResetExplored = staticmethod(getAndResetExplored)
 
@@ -90,7 +153,6 @@ class GameState:
         """
         Returns the legal actions for the agent specified.
         """
-#        GameState.explored.add(self)
         if self.isWin() or self.isLose():
             return []
 
@@ -109,29 +171,79 @@ class GameState:
 
         # Copy current state
         state = GameState(self)
+        state._applyRules(agentIndex, action)
 
+        # Book keeping
+        if GameState.tracker is not None:
+            GameState.tracker.record(self, state)
+        return state
+
+    def apply(self, agentIndex, action):
+        """
+        Makes the specified agent take the action on this state in place,
+        rather than on a copy as generateSuccessor does, and returns a token
+        that undo() uses to restore the state exactly.
+
+        This lets a search walk the tree with a single working state: apply
+        a move, search below it, then undo it.  Moves must be undone in the
+        reverse order they were applied, and AgentStates fetched from the
+        state (e.g. by getGhostStates) change along with it.  Moves applied
+        this way are not reported to GameState.tracker (see trackExplored).
+        """
+        if self.isWin() or self.isLose():
+            raise Exception('Can\'t apply an action to a terminal state.')
+
+        data = self.data
+        token = ([(agentState.configuration, agentState.scaredTimer) for agentState in data.agentStates],
+                 data.food, data.capsules, data.score, data.scoreChange, data._eaten,
+                 data._foodEaten, data._foodAdded, data._capsuleEaten, data._agentMoved,
+                 data._hash)
+
+        # Start from the same per-move bookkeeping a fresh successor gets
+        data.scoreChange = 0
+        data._foodEaten = None
+        data._foodAdded = None
+        data._capsuleEaten = None
+        self._applyRules(agentIndex, action)
+        return token
+
+    def undo(self, token):
+        """
+        Reverts the move that returned `token` from apply().
+        """
+        data = self.data
+        (agentConfigurations, data.food, data.capsules, data.score, data.scoreChange, data._eaten,
+         data._foodEaten, data._foodAdded, data._capsuleEaten, data._agentMoved,
+         data._hash) = token
+        for agentState, (configuration, scaredTimer) in zip(data.agentStates, agentConfigurations):
+            agentState.configuration = configuration
+            agentState.scaredTimer = scaredTimer
+        data._win = False  # Only non-terminal states can be moved from
+        data._lose = False
+
+    def _applyRules(self, agentIndex, action):
+        """
+        Edits this state to reflect the effects of the agent's action.
+        """
         # Let agent's logic deal with its action's effects on the board
         if agentIndex == 0:  # Pacman is moving
-            state.data._eaten = [False for i in range(state.getNumAgents())]
-            PacmanRules.applyAction(state, action)
+            self.data._eaten = [False for i in range(self.getNumAgents())]
+            PacmanRules.applyAction(self, action)
         else:                # A ghost is moving
-            GhostRules.applyAction(state, action, agentIndex)
+            GhostRules.applyAction(self, action, agentIndex)
 
         # Time passes
         if agentIndex == 0:
-            state.data.scoreChange += -TIME_PENALTY  # Penalty for waiting around
+            self.data.scoreChange += -TIME_PENALTY  # Penalty for waiting around
         else:
-            GhostRules.decrementTimer(state.data.agentStates[agentIndex])
+            GhostRules.decrementTimer(self, agentIndex)
 
         # Resolve multi-agent effects
-        GhostRules.checkDeath(state, agentIndex)
+        GhostRules.checkDeath(self, agentIndex)
 
         # Book keeping
-        state.data._agentMoved = agentIndex
-        state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
-        return state
+        self.data._agentMoved = agentIndex
+        self.data.score += self.data.scoreChange
 
     def getLegalPacmanActions(self):
         return self.getLegalActions(0)
@@ -212,6 +324,15 @@ class GameState:
     def hasFood(self, x, y):
         return self.data.food[x][y]
 
+    def getMazeDistance(self, pos1, pos2):
+        """
+        Returns the length of the shortest path between two positions through
+        the maze, unlike util.manhattanDistance which ignores walls.  The
+        all-pairs distance table is built on first use (see layout.py), after
+        which each query is a lookup.
+        """
+        return self.data.layout.getMazeDistance(pos1, pos2)
+
     def hasWall(self, x, y):
         return self.data.layout.walls[x][y]
 
@@ -348,7 +469,11 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions(state.getPacmanState().configuration, state.data.layout.walls)
+        configuration = state.data.agentStates[0].configuration
+        actions = state.data.layout.getLegalActionTables()[0].get(configuration.pos)
+        if actions != None:  # On a grid point: use the precomputed table
+            return list(actions)
+        return Actions.getPossibleActions(configuration, state.data.layout.walls)
     getLegalActions = staticmethod(getLegalActions)
 
     def applyAction(state, action):
@@ -363,8 +488,8 @@ class PacmanRules:
 
         # Update Configuration
         vector = Actions.directionToVector(action, PacmanRules.PACMAN_SPEED)
-        pacmanState.configuration = pacmanState.configuration.generateSuccessor(
-            vector)
+        state.data.moveAgent(
+            0, pacmanState.configuration.generateSuccessor(vector))
 
         # Eat
         next = pacmanState.configuration.getPosition()
@@ -379,8 +504,7 @@ class PacmanRules:
         # Eat food
         if state.data.food[x][y]:
             state.data.scoreChange += 10
-            state.data.food = state.data.food.copy()
-            state.data.food[x][y] = False
+            state.data.removeFood(x, y)
             state.data._foodEaten = position
             # TODO: cache numFood?
             numFood = state.getNumFood()
@@ -389,11 +513,11 @@ class PacmanRules:
                 state.data._win = True
         # Eat capsule
         if(position in state.getCapsules()):
-            state.data.capsules.remove(position)
+            state.data.removeCapsule(position)
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range(1, len(state.data.agentStates)):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.setScaredTimer(index, SCARED_TIME)
     consume = staticmethod(consume)
 
 
@@ -409,6 +533,10 @@ class GhostRules:
         reach a dead end, but can turn 90 degrees at intersections.
         """
         conf = state.getGhostState(ghostIndex).configuration
+        actions = state.data.layout.getLegalActionTables()[1].get(
+            (conf.pos, conf.direction))
+        if actions != None:  # On a grid point: use the precomputed table
+            return list(actions)
         possibleActions = Actions.getPossibleActions(
             conf, state.data.layout.walls)
         reverse = Actions.reverseDirection(conf.direction)
@@ -430,16 +558,19 @@ class GhostRules:
         if ghostState.scaredTimer > 0:
             speed /= 2.0
         vector = Actions.directionToVector(action, speed)
-        ghostState.configuration = ghostState.configuration.generateSuccessor(
-            vector)
+        state.data.moveAgent(
+            ghostIndex, ghostState.configuration.generateSuccessor(vector))
     applyAction = staticmethod(applyAction)
 
-    def decrementTimer(ghostState):
+    def decrementTimer(state, ghostIndex):
+        ghostState = state.data.agentStates[ghostIndex]
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint(
-                ghostState.configuration.pos)
-        ghostState.scaredTimer = max(0, timer - 1)
+            # Snap back onto the grid now that full speed resumes
+            configuration = ghostState.configuration
+            state.data.moveAgent(ghostIndex, Configuration(
+                nearestPoint(configuration.pos), configuration.direction))
+        state.data.setScaredTimer(ghostIndex, max(0, timer - 1))
     decrementTimer = staticmethod(decrementTimer)
 
     def checkDeath(state, agentIndex):
@@ -460,9 +591,10 @@ class GhostRules:
     def collide(state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
             state.data.scoreChange += 200
-            GhostRules.placeGhost(state, ghostState)
-            ghostState.scaredTimer = 0
-            # Added for first-person
+            GhostRules.placeGhost(state, agentIndex)
+            state.data.setScaredTimer(agentIndex, 0)
+            # Added for first-person; the list may be shared with the parent
+            state.data._eaten = state.data._eaten[:]
             state.data._eaten[agentIndex] = True
         else:
             if not state.data._win:
@@ -474,8 +606,9 @@ class GhostRules:
         return manhattanDistance(ghostPosition, pacmanPosition) <= COLLISION_TOLERANCE
     canKill = staticmethod(canKill)
 
-    def placeGhost(state, ghostState):
-        ghostState.configuration = ghostState.start
+    def placeGhost(state, ghostIndex):
+        ghostState = state.data.agentStates[ghostIndex]
+        state.data.moveAgent(ghostIndex, ghostState.start)
     placeGhost = staticmethod(placeGhost)
 
 #############################
@@ -501,6 +634,26 @@ def parseAgentArgs(str):
     return opts
 
 
+class SearchStatsLog:
+    """
+    Appends each search statistics record an agent sends to a file, as one
+    JSON object per line (see multiAgents.SearchStats).  The file is opened
+    for every record, so the log survives being copied to worker processes.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        open(filename, 'w').close()
+
+    def write(self, stats):
+        import json
+        f = open(self.filename, 'a')
+        try:
+            f.write(json.dumps(stats.asDict()) + '\n')
+        finally:
+            f.close()
+
+
 def readCommand(argv):
     """
     Processes the command used to run pacman from the command line.
@@ -554,11 +707,26 @@ def readCommand(argv):
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--workers', dest='workers', type='int',
+                      help=default('Play the games in this many processes, without graphics and with a seed per game; '
+                                   '1 plays the same games in this process'), default=0)
+    parser.add_option('--searchStats', dest='searchStats',
+                      help='Write statistics of every search Pacman runs to this file, one JSON line per move',
+                      default=None)
+    parser.add_option('--profile', dest='profile', type='choice', choices=['cprofile', 'sampling'],
+                      help='Profile the games, with graphics off, using cprofile or sampling (see profiling.py)',
+                      default=None)
+    parser.add_option('--profileOut', dest='profileOut',
+                      help=default('Prefix of the profile files written by --profile'), default='pacman-profile')
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
         raise Exception('Command line input not understood: ' + str(otherjunk))
     args = dict()
+    if options.profile:
+        if options.workers:
+            raise Exception('Profiling sees only this process (drop --workers)')
+        options.quietGraphics = True
 
     # Fix the random seed
     if options.fixRandomSeed:
@@ -580,6 +748,10 @@ def readCommand(argv):
             agentOpts['numTraining'] = options.numTraining
     pacman = pacmanType(**agentOpts)  # Instantiate Pacman with agentArgs
     args['pacman'] = pacman
+    if options.searchStats:
+        if not hasattr(pacman, 'collectSearchStats'):
+            raise Exception('The agent ' + options.pacman + ' does not record search statistics')
+        pacman.collectSearchStats(SearchStatsLog(options.searchStats))
 
     # Don't display training games
     if 'numTrain' in agentOpts:
@@ -606,12 +778,15 @@ def readCommand(argv):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['workers'] = options.workers
+    if options.profile:
+        args['profile'] = options.profile, options.profileOut
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
         print('Replaying recorded game %s.' % options.gameToReplay)
         import pickle
-        f = open(options.gameToReplay)
+        f = open(options.gameToReplay, 'rb')
         try:
             recorded = pickle.load(f)
         finally:
@@ -672,10 +847,119 @@ def replayGame(layout, actions, display):
     display.finish()
 
 
-def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30):
+class GameResult:
+    """
+    The outcome of a game played by runGames in worker mode: scores, flags
+    and the move history, without the Game and its states.
+    """
+
+    def __init__(self, game, index):
+        self.index = index
+        self.score = game.state.getScore()
+        self.win = game.state.isWin()
+        self.lose = game.state.isLose()
+        self.agentTimeout = game.agentTimeout
+        self.agentCrashed = game.agentCrashed
+        self.moveHistory = game.moveHistory
+        self.numMoves = len(game.moveHistory)
+
+    def getScore(self):
+        return self.score
+
+    def isWin(self):
+        return self.win
+
+    def isLose(self):
+        return self.lose
+
+
+def playGame(layout, pacman, ghosts, index, seed, catchExceptions=False, timeout=30):
+    """
+    Plays one headless game from its own random seed and returns a
+    GameResult.  Runs in a worker process when runGames has workers.
+    """
+    import textDisplay
+    random.seed(seed)
+    if hasattr(pacman, 'games'):
+        pacman.games = index #each game has a fresh copy, so number its search records as a serial run would
+    rules = ClassicGameRules(timeout)
+    game = rules.newGame(layout, pacman, ghosts,
+                         textDisplay.NullGraphics(), True, catchExceptions)
+    game.run()
+    return GameResult(game, index)
+
+
+def runGamesInWorkers(layout, pacman, ghosts, numGames, record, workers, catchExceptions=False, timeout=30):
+    """
+    Plays numGames games across a pool of `workers` processes, printing each
+    result as it arrives, and returns the GameResults in game order.  Game i
+    is seeded with baseSeed + i and plays with fresh copies of the agents,
+    so the results do not depend on the number of workers, and workers=1
+    plays the same games in this process.
+    """
+    import copy
+    baseSeed = random.randrange(2 ** 31)
+    results = []
+
+    def report(result):
+        print('Game %d/%d: %s Score: %d' % (result.index + 1, numGames,
+                                            ['Pacman died!', 'Pacman emerges victorious!'][int(result.win)], result.score))
+        results.append(result)
+
+    if workers == 1:
+        for i in range(numGames):
+            report(playGame(layout, copy.deepcopy(pacman), copy.deepcopy(ghosts),
+                            i, baseSeed + i, catchExceptions, timeout))
+    else:
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(playGame, layout, pacman, ghosts, i, baseSeed + i, catchExceptions, timeout)
+                       for i in range(numGames)]
+            for future in concurrent.futures.as_completed(futures):
+                report(future.result())
+
+    results.sort(key=lambda result: result.index)
+    if record:
+        for result in results:
+            recordGame(layout, result.moveHistory, result.index)
+    return results
+
+
+def recordGame(layout, moveHistory, index):
+    import time
+    import pickle
+    fname = ('recorded-game-%d' % (index + 1)) + \
+        '-'.join([str(t) for t in time.localtime()[1:6]])
+    f = open(fname, 'wb')
+    components = {'layout': layout, 'actions': moveHistory}
+    pickle.dump(components, f)
+    f.close()
+
+
+def printSummary(scores, wins):
+    winRate = wins.count(True) / float(len(wins))
+    print('Average Score:', sum(scores) / float(len(scores)))
+    print('Scores:       ', ', '.join([str(score) for score in scores]))
+    print('Win Rate:      %d/%d (%.2f)' %
+          (wins.count(True), len(wins), winRate))
+    print('Record:       ', ', '.join(
+        [['Loss', 'Win'][int(w)] for w in wins]))
+
+
+def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30, workers=0):
     import __main__
     __main__.__dict__['_display'] = display
 
+    if workers > 0:
+        if numTraining > 0:
+            raise Exception('Training games must be played in one process (drop --workers)')
+        results = runGamesInWorkers(layout, pacman, ghosts, numGames, record,
+                                    workers, catchExceptions, timeout)
+        if numGames > 0:
+            printSummary([result.score for result in results],
+                         [result.win for result in results])
+        return results
+
     rules = ClassicGameRules(timeout)
     games = []
 
@@ -696,25 +980,12 @@ def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, c
             games.append(game)
 
         if record:
-            import time
-            import pickle
-            fname = ('recorded-game-%d' % (i + 1)) + \
-                '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            pickle.dump(components, f)
-            f.close()
+            recordGame(layout, game.moveHistory, i)
 
     if (numGames-numTraining) > 0:
         scores = [game.state.getScore() for game in games]
         wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True) / float(len(wins))
-        print('Average Score:', sum(scores) / float(len(scores)))
-        print('Scores:       ', ', '.join([str(score) for score in scores]))
-        print('Win Rate:      %d/%d (%.2f)' %
-              (wins.count(True), len(wins), winRate))
-        print('Record:       ', ', '.join(
-            [['Loss', 'Win'][int(w)] for w in wins]))
+        printSummary(scores, wins)
 
     return games
 
@@ -731,8 +1002,9 @@ if __name__ == '__main__':
     > python pacman.py --help
     """
     args = readCommand(sys.argv[1:])  # Get game components based on input
-    runGames(**args)
-
-    # import cProfile
-    # cProfile.run("runGames( **args )")
-    pass
+    profile = args.pop('profile', None)
+    if profile:
+        import profiling
+        profiling.profileGames(runGames, args, *profile)
+    else:
+        runGames(**args)
@@ -0,0 +1,239 @@
+# profiling.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Profiles a whole runGames run, as pacman.py --profile does:
+
+  python pacman.py -p ExpectimaxAgent -a depth=3 -n 3 --profile cprofile
+  python pacman.py -p AlphaBetaAgent -l mediumClassic --profile sampling --profileOut ab
+
+The report splits the time between the framework (the Game.run loop,
+copying states for the agents, applying moves and the rules, the display,
+and setting up the games) and the agents (the time inside each agent
+class's getAction).  Both modes write the profile in pstats format to
+<profileOut>.pstats, for python -m pstats or snakeviz.  The sampling
+profiler records whole stacks, so it also writes <profileOut>.collapsed,
+one "frame;frame;... count" line per stack, which flamegraph.pl and
+speedscope read.
+"""
+
+import cProfile
+import collections
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+
+MODES = ['cprofile', 'sampling']
+SAMPLE_INTERVAL = 0.001  # seconds between stack samples
+
+def profileGames(runGames, args, mode='cprofile', out='pacman-profile'):
+    """
+    Runs runGames(**args) under the profiler, writes the profile files and
+    prints the report.  Returns the games played.
+    """
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        start = time.time()
+        games = profiler.runcall(runGames, **args)
+        elapsed = time.time() - start
+        profiler.dump_stats(out + '.pstats')
+        written = [out + '.pstats']
+    elif mode == 'sampling':
+        sampler = StackSampler(SAMPLE_INTERVAL)
+        start = time.time()
+        sampler.start()
+        try:
+            games = runGames(**args)
+        finally:
+            sampler.stop()
+        elapsed = time.time() - start
+        sampler.writeStats(out + '.pstats')
+        sampler.writeCollapsed(out + '.collapsed')
+        written = [out + '.pstats', out + '.collapsed']
+    else:
+        raise Exception('Unknown profile mode: ' + mode)
+
+    stats = pstats.Stats(out + '.pstats')
+    agents = [args['pacman']] + list(args['ghosts'])
+    printReport(breakdown(stats.stats, agents), elapsed, mode, len(games))
+    print()
+    stats.sort_stats('tottime').print_stats(10)
+    print('Wrote ' + ', '.join(written))
+    return games
+
+def functionKey(code):
+    """
+    The (filename, first line, name) key that pstats uses for a function.
+    """
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+def agentMethods(agents):
+    """
+    Maps the pstats key of each agent class's getAction to a label for the
+    report.  Ghosts of the same class share one entry.
+    """
+    methods = {}
+    for agent in agents:
+        code = getattr(getattr(type(agent), 'getAction', None), '__code__', None)
+        if code is not None:
+            methods[functionKey(code)] = type(agent).__name__ + '.getAction'
+    return methods
+
+def frameworkCategory(function):
+    """
+    The part of the framework a function that Game.run calls belongs to.
+    """
+    filename, _, name = function
+    if name == 'deepCopy':
+        return 'deepCopy'
+    if name in ('generateSuccessor', 'process'):
+        return 'rules'
+    if os.path.basename(filename) in ('textDisplay.py', 'graphicsDisplay.py', 'graphicsUtils.py'):
+        return 'display'
+    return 'game loop'
+
+def breakdown(stats, agents):
+    """
+    Splits the profiled time, from a pstats dictionary, into framework and
+    agent categories.  Returns {'framework': {category: seconds}, 'agents':
+    {label: seconds}}.
+    """
+    import game
+    gameRun = functionKey(game.Game.run.__code__)
+    total = max([entry[3] for entry in stats.values()] + [0.0])
+    methods = agentMethods(agents)
+
+    agentTimes = collections.OrderedDict()
+    for function, label in methods.items():
+        if function in stats:
+            agentTimes[label] = agentTimes.get(label, 0.0) + stats[function][3]
+
+    framework = collections.OrderedDict((category, 0.0) for category in
+                                        ['game loop', 'deepCopy', 'rules', 'display', 'setup'])
+    runTime = stats[gameRun][3] if gameRun in stats else 0.0
+    for function, entry in stats.items():
+        callers = entry[4]
+        if gameRun in callers and function not in methods:
+            category = frameworkCategory(function)
+            if category != 'game loop':
+                framework[category] += callers[gameRun][3]
+    # whatever Game.run spent outside the agents and the categories above is the loop itself
+    framework['game loop'] = max(runTime - sum(agentTimes.values()) - sum(framework.values()), 0.0)
+    framework['setup'] = max(total - runTime, 0.0)
+    return {'framework': framework, 'agents': agentTimes}
+
+def printReport(times, elapsed, mode, numGames):
+    total = sum(times['framework'].values()) + sum(times['agents'].values())
+    def line(name, seconds, indent):
+        share = 100.0 * seconds / total if total else 0.0
+        print('%s%-*s %9.3f s %6.1f%%' % (' ' * indent, 36 - indent, name, seconds, share))
+
+    print('Profile of %d game%s (%s), %.2f s wall time' % (numGames, '' if numGames == 1 else 's', mode, elapsed))
+    for part in ('framework', 'agents'):
+        line(part.capitalize(), sum(times[part].values()), 2)
+        for name, seconds in sorted(times[part].items(), key=lambda item: -item[1]):
+            line(name, seconds, 4)
+
+class StackSampler:
+    """
+    A statistical profiler: a background thread records the main thread's
+    stack every `interval` seconds.  Each sample stands for the time since
+    the previous one.  Python switches threads every sys.getswitchinterval()
+    seconds, so that is lowered to the interval while sampling.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = collections.Counter()  # tuple of (filename, line, name) from the root -> samples
+        self.samples = 0
+        self.elapsed = 0.0
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        self.target = threading.main_thread().ident
+        self.switchInterval = sys.getswitchinterval()
+        sys.setswitchinterval(self.interval)
+        self.startTime = time.time()
+        self.thread = threading.Thread(target=self.sample)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+        self.elapsed = time.time() - self.startTime
+        sys.setswitchinterval(self.switchInterval)
+
+    def sample(self):
+        while not self.stopping.is_set():
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                stack.append(functionKey(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    def sampleTime(self):
+        return self.elapsed / self.samples if self.samples else 0.0
+
+    def writeCollapsed(self, filename):
+        f = open(filename, 'w')
+        try:
+            for stack, count in sorted(self.stacks.items()):
+                frames = ['%s (%s:%d)' % (name, os.path.basename(path), line) for path, line, name in stack]
+                f.write('%s %d\n' % (';'.join(frames), count))
+        finally:
+            f.close()
+
+    def writeStats(self, filename):
+        """
+        Writes the samples as a pstats file: own and cumulative times are
+        the samples with the function on top of and anywhere in the stack;
+        call counts are sample counts, since sampling cannot see calls.
+        """
+        dt = self.sampleTime()
+        own = collections.Counter()
+        cumulative = collections.Counter()
+        edges = collections.defaultdict(collections.Counter)  # callee -> caller -> samples
+        edgesOwn = collections.defaultdict(collections.Counter)
+        for stack, count in self.stacks.items():
+            if not stack:
+                continue
+            own[stack[-1]] += count
+            for function in set(stack):
+                cumulative[function] += count
+            seen = set()
+            for caller, callee in zip(stack, stack[1:]):
+                if (caller, callee) not in seen:
+                    seen.add((caller, callee))
+                    edges[callee][caller] += count
+            if len(stack) > 1:
+                edgesOwn[stack[-1]][stack[-2]] += count
+        stats = {}
+        for function, count in cumulative.items():
+            callers = dict((caller, (n, n, edgesOwn[function][caller] * dt, n * dt))
+                           for caller, n in edges[function].items())
+            stats[function] = (count, count, own[function] * dt, count * dt, callers)
+        f = open(filename, 'wb')
+        try:
+            marshal.dump(stats, f)
+        finally:
+            f.close()
@@ -0,0 +1,6 @@
+# tests
+# -----
+# Checks of the game engine, the search agents and the tools around them.
+# Run them from the project directory with 'python -m unittest' or
+# 'python -m pytest tests'.  The student questions are graded separately by
+# autograder.py.
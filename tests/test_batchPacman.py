@@ -0,0 +1,22 @@
+# test_batchPacman.py
+# -------------------
+# The batch environment must play exactly like GameState.
+
+import unittest
+
+import batchPacman
+import layout
+
+
+@unittest.skipUnless(batchPacman._NUMPY_ENABLED, 'the batch environment needs numpy')
+class ConformanceTest(unittest.TestCase):
+
+    def testAgreesWithGameState(self):
+        for layoutName, numGhosts in [('smallClassic', 2), ('mediumClassic', 4), ('capsuleClassic', 3)]:
+            checked = batchPacman.checkConformance(layout.getLayout(layoutName), numGames=10,
+                                                   maxMoves=200, numGhosts=numGhosts, seed=1)
+            self.assertGreater(checked, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# test_gameState.py
+# -----------------
+# GameState's incremental bookkeeping must match what it stands for.
+
+import random
+import unittest
+
+import layout
+from pacman import GameState
+
+LAYOUTS = [('smallClassic', 2), ('capsuleClassic', 3), ('mediumClassic', 2)]
+
+
+def randomGames(numGames=5, maxMoves=150, seed=0):
+    """
+    Yields (state, agentIndex, action) for every move of seeded random games
+    on LAYOUTS, with the state before the move.
+    """
+    rand = random.Random(seed)
+    for layoutName, numGhosts in LAYOUTS:
+        for game in range(numGames):
+            state = GameState()
+            state.initialize(layout.getLayout(layoutName), numGhosts)
+            for move in range(maxMoves):
+                agentIndex = move % state.getNumAgents()
+                action = rand.choice(state.getLegalActions(agentIndex))
+                yield state, agentIndex, action
+                state = state.generateSuccessor(agentIndex, action)
+                if state.isWin() or state.isLose():
+                    break
+
+
+class ZobristHashTest(unittest.TestCase):
+
+    def testIncrementalHashMatchesRecomputation(self):
+        for state, agentIndex, action in randomGames():
+            successor = state.generateSuccessor(agentIndex, action)
+            self.assertEqual(successor.data._hash, successor.data.computeHash())
+
+    def testEqualStatesHashAlike(self):
+        for state, agentIndex, action in randomGames(numGames=2):
+            copy = state.deepCopy()
+            self.assertEqual(copy, state)
+            self.assertEqual(hash(copy), hash(state))
+
+    def testHashFollowsScaredTimers(self):
+        rand = random.Random(0)
+        state = GameState()
+        state.initialize(layout.Layout(['%%%%%%%%%',
+                                        '%Po.. .G%',
+                                        '%.%%%%%.%',
+                                        '%...G...%',
+                                        '%%%%%%%%%']), 2)
+        state = state.generateSuccessor(0, 'East') #eats the capsule
+        self.assertTrue(state.getGhostState(1).scaredTimer > 0)
+        for move in range(60):
+            agentIndex = move % state.getNumAgents()
+            state = state.generateSuccessor(agentIndex, rand.choice(state.getLegalActions(agentIndex)))
+            self.assertEqual(state.data._hash, state.data.computeHash())
+            if state.isWin() or state.isLose():
+                break
+
+class ApplyUndoTest(unittest.TestCase):
+
+    def assertSameState(self, state, other):
+        self.assertEqual(state, other)
+        self.assertEqual(hash(state), hash(other))
+        self.assertEqual(state.getScore(), other.getScore())
+        self.assertEqual((state.isWin(), state.isLose()), (other.isWin(), other.isLose()))
+        self.assertEqual([g.scaredTimer for g in state.getGhostStates()],
+                         [g.scaredTimer for g in other.getGhostStates()])
+
+    def testApplyMatchesGenerateSuccessor(self):
+        for state, agentIndex, action in randomGames():
+            working = state.deepCopy()
+            token = working.apply(agentIndex, action)
+            self.assertSameState(working, state.generateSuccessor(agentIndex, action))
+            working.undo(token)
+            self.assertSameState(working, state)
+            self.assertEqual(working.data._hash, state.data._hash)
+
+    def testNestedMovesUndoInReverse(self):
+        rand = random.Random(1)
+        for state, agentIndex, action in randomGames(numGames=2):
+            working = state.deepCopy()
+            path = [state]
+            tokens = []
+            for move in range(6):
+                index = (agentIndex + move) % working.getNumAgents()
+                if working.isWin() or working.isLose():
+                    break
+                nextAction = rand.choice(working.getLegalActions(index))
+                tokens.append(working.apply(index, nextAction))
+                path.append(path[-1].generateSuccessor(index, nextAction))
+                self.assertSameState(working, path[-1])
+            while tokens:
+                working.undo(tokens.pop())
+                path.pop()
+                self.assertSameState(working, path[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
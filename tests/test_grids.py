@@ -0,0 +1,58 @@
+# test_grids.py
+# -------------
+# A BitGrid must behave exactly like the list-of-lists Grid it replaces.
+
+import random
+import unittest
+
+from game import BitGrid, Grid
+
+
+class BitGridTest(unittest.TestCase):
+
+    def randomWrites(self, width, height, numWrites, seed):
+        rand = random.Random(seed)
+        return [(rand.randrange(width), rand.randrange(height), rand.random() < 0.6) for i in range(numWrites)]
+
+    def assertSameGrid(self, bitGrid, grid):
+        self.assertEqual(bitGrid.data, grid.data)
+        self.assertEqual(bitGrid.count(), grid.count())
+        self.assertEqual(bitGrid.count(False), grid.count(False))
+        self.assertEqual(bitGrid.asList(), grid.asList())
+        self.assertEqual(bitGrid.asList(False), grid.asList(False))
+        self.assertEqual(bitGrid, grid)
+        self.assertEqual(hash(bitGrid), hash(grid))
+        self.assertEqual(bitGrid.packBits(), grid.packBits())
+        self.assertEqual(str(bitGrid), str(grid))
+
+    def testMatchesGrid(self):
+        for width, height, seed in [(1, 1, 0), (7, 5, 1), (20, 11, 2), (28, 27, 3)]:
+            bitGrid, grid = BitGrid(width, height), Grid(width, height)
+            for x, y, value in self.randomWrites(width, height, 3 * width * height, seed):
+                bitGrid[x][y] = value
+                grid[x][y] = value
+                self.assertEqual(bitGrid[x][y], value)
+            self.assertSameGrid(bitGrid, grid)
+            self.assertSameGrid(BitGrid.fromGrid(grid), grid)
+            self.assertSameGrid(BitGrid(width, height, bitRepresentation=grid.packBits()[2:]), grid)
+
+    def testCopiesAreIndependent(self):
+        original = BitGrid(6, 4)
+        original[2][3] = True
+        self.assertEqual(original.asList(), [(2, 3)]) #fills the cached list
+        for copy in (original.copy(), original.deepCopy(), original.shallowCopy()):
+            copy[2][3] = False
+            copy[0][0] = True
+            self.assertEqual(copy.asList(), [(0, 0)])
+            self.assertEqual(original.asList(), [(2, 3)])
+            self.assertEqual(original.count(), 1)
+
+    def testNegativeColumns(self):
+        bitGrid = BitGrid(3, 2)
+        bitGrid[-1][1] = True
+        self.assertTrue(bitGrid[2][1])
+        self.assertRaises(IndexError, lambda: bitGrid[3])
+
+
+if __name__ == '__main__':
+    unittest.main()
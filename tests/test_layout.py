@@ -0,0 +1,142 @@
+# test_layout.py
+# --------------
+# Layout loading and the tables derived from a layout.
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import layout
+
+
+def breadthFirstDistances(walls, source):
+    distances = {source: 0}
+    frontier = [source]
+    while frontier:
+        nextFrontier = []
+        for x, y in frontier:
+            for cell in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                if cell not in distances and not walls[cell[0]][cell[1]]:
+                    distances[cell] = distances[(x, y)] + 1
+                    nextFrontier.append(cell)
+        frontier = nextFrontier
+    return distances
+
+
+class MazeDistancesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cacheDir = layout.DISTANCE_CACHE_DIR
+        layout.DISTANCE_CACHE_DIR = ''
+
+    def tearDown(self):
+        layout.DISTANCE_CACHE_DIR = self.cacheDir
+
+    def testMatchesBreadthFirstSearch(self):
+        rand = random.Random(0)
+        for layoutName in ('smallClassic', 'mediumClassic', 'trickyClassic'):
+            maze = layout.getLayout(layoutName)
+            table = layout.MazeDistances(maze)
+            for source in rand.sample(table.cells, 10):
+                expected = breadthFirstDistances(maze.walls, source)
+                for cell in table.cells:
+                    self.assertEqual(table.getDistance(cell, source), expected[cell])
+                    self.assertEqual(table.getDistance(source, cell), expected[cell])
+            self.assertTrue(len(table.rows) < table.numCells) #only the rows asked for were built
+
+    def testScaredGhostPositionsAndWalls(self):
+        table = layout.MazeDistances(layout.getLayout('smallClassic'))
+        x, y = table.cells[0]
+        self.assertEqual(table.getDistance((x + 0.4, y), (x, y)), 0)
+        self.assertRaises(Exception, table.getDistance, (0, 0), (x, y))
+
+    def testUnreachableCells(self):
+        maze = layout.Layout(['%%%%%%', '%P %G%', '%%%%%%'])
+        table = layout.MazeDistances(maze)
+        self.assertEqual(table.getDistance((1, 1), (4, 1)), layout.MazeDistances.UNREACHABLE)
+        self.assertEqual(table.getDistance((1, 1), (2, 1)), 1)
+
+    def testDiskCacheIsOptIn(self):
+        directory = tempfile.mkdtemp()
+        try:
+            maze = layout.getLayout('smallClassic')
+            key = str(maze) + '\n'  # a text of its own, so other tests' tables are not reused
+            if 'PACMAN_CACHE_DIR' not in os.environ:
+                self.assertEqual(self.cacheDir, '')
+            self.assertEqual(layout.MazeDistances.load(maze, key).rows, {}) #nothing computed or saved
+
+            layout.DISTANCE_CACHE_DIR = os.path.join(directory, 'pacman')
+            saved = layout.MazeDistances.load(maze, key)
+            self.assertEqual(len(saved.rows), saved.numCells)
+            self.assertEqual(len(os.listdir(layout.DISTANCE_CACHE_DIR)), 1)
+            loaded = layout.MazeDistances.load(maze, key)
+            self.assertEqual(loaded.rows, saved.rows)
+        finally:
+            shutil.rmtree(directory)
+
+
+class LayoutLoadingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'maze.lay')
+        shutil.copy(os.path.join('layouts', 'smallClassic.lay'), self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSameLayout(self, loaded, expected):
+        for name in ('width', 'height', 'walls', 'food', 'capsules', 'agentPositions',
+                     'numGhosts', 'totalFood', 'layoutText'):
+            self.assertEqual(getattr(loaded, name), getattr(expected, name), name)
+        self.assertEqual(loaded.getLegalActionTables(), expected._buildLegalActionTables())
+
+    def testCallersGetPrivateCopies(self):
+        first = layout.getLayout(self.source)
+        first.walls[0][0] = False
+        first.food[1][1] = not first.food[1][1]
+        first.capsules.append((1, 1))
+        second = layout.getLayout(self.source)
+        self.assertIsNot(second, first)
+        self.assertSameLayout(second, layout.Layout([line.strip() for line in open(self.source)]))
+
+    def testEditedFilesAreReloaded(self):
+        before = layout.getLayout(self.source)
+        with open(self.source, 'a') as f:
+            f.write('%%%%%%%%%%%%%%%%%%%%\n')
+        self.assertEqual(layout.getLayout(self.source).height, before.height + 1)
+
+    def testNamesAreFoundWithoutChangingDirectory(self):
+        cwd = os.getcwd()
+        os.chdir(self.directory)
+        try:
+            self.assertEqual(layout.getLayout('maze').width, 20)
+            self.assertEqual(layout.getLayout('smallClassic').width, 20) #next to layout.py
+            self.assertEqual(layout.getLayout('noSuchLayout'), None)
+            self.assertEqual(os.getcwd(), os.path.realpath(self.directory))
+        finally:
+            os.chdir(cwd)
+
+    def testCompiledLayoutRoundTrip(self):
+        compiled = os.path.join(self.directory, 'maze.layc')
+        expected = layout.getLayout(self.source)
+        layout.compileLayout(expected, compiled)
+        self.assertSameLayout(layout.getLayout(compiled), expected)
+
+    def testBadCompiledLayoutsFallBackToTheSource(self):
+        expected = layout.getLayout(self.source)
+        compiled = os.path.join(self.directory, 'maze.layc')
+        for contents in (layout.CompiledLayout.MAGIC + b'\x00garbage',  # another marshal version
+                         layout.CompiledLayout.dumps(expected)[:-20]):  # truncated
+            with open(compiled, 'wb') as f:
+                f.write(contents)
+            self.assertSameLayout(layout.getLayout(compiled), expected)
+        os.remove(self.source)
+        os.utime(compiled, (0, 0)) #not the registered version
+        self.assertRaises(Exception, layout.getLayout, compiled)
+
+
+if __name__ == '__main__':
+    unittest.main()
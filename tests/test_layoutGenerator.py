@@ -0,0 +1,65 @@
+# test_layoutGenerator.py
+# -----------------------
+# Generated mazes must be reproducible, connected and playable.
+
+import unittest
+
+import layout
+import layoutGenerator
+from pacman import GameState
+
+
+class GeneratorTest(unittest.TestCase):
+
+    SIZES = [(5, 5), (8, 7), (6, 6), (31, 15), (30, 16), (101, 101), (150, 120)]
+
+    def testSameSeedSameMaze(self):
+        for width, height in self.SIZES:
+            text = layoutGenerator.generateLayoutText(width, height, seed='maze')
+            self.assertEqual(text, layoutGenerator.generateLayoutText(width, height, seed='maze'))
+        self.assertNotEqual(layoutGenerator.generateLayoutText(31, 15, seed=1),
+                            layoutGenerator.generateLayoutText(31, 15, seed=2))
+
+    def testMazesAreValid(self):
+        for width, height in self.SIZES:
+            for seed in range(3):
+                maze = layoutGenerator.generateLayout(width, height, numGhosts=3, seed=seed)
+                self.assertEqual((maze.width, maze.height), (width, height))
+                self.assertTrue(all(maze.walls[x][0] and maze.walls[x][height - 1] for x in range(width)))
+                self.assertTrue(all(maze.walls[0][y] and maze.walls[width - 1][y] for y in range(height)))
+                # no solid second border, whatever the parity of the size
+                self.assertFalse(all(maze.walls[x][height - 2] for x in range(1, width - 1)))
+                self.assertFalse(all(maze.walls[width - 2][y] for y in range(1, height - 1)))
+
+                pacman = [position for isPacman, position in maze.agentPositions if isPacman]
+                ghosts = [position for isPacman, position in maze.agentPositions if not isPacman]
+                self.assertEqual((len(pacman), len(ghosts), maze.numGhosts), (1, 3, 3))
+                self.assertEqual(len(set(pacman + ghosts)), 4)
+                self.assertGreater(maze.totalFood, 0)
+
+                distances = layout.MazeDistances(maze)
+                for cell in distances.cells:
+                    self.assertNotEqual(distances.getDistance(pacman[0], cell), distances.UNREACHABLE)
+
+    def testDensities(self):
+        sparse = layoutGenerator.generateLayout(61, 61, wallDensity=0.2, foodDensity=0.1, capsules=0, seed=0)
+        dense = layoutGenerator.generateLayout(61, 61, wallDensity=0.45, foodDensity=0.9, capsules=6, seed=0)
+        self.assertLess(sparse.walls.count(), dense.walls.count())
+        self.assertLessEqual(sparse.walls.count() - 2 * 61 - 2 * 59, int(0.2 * 59 * 59))
+        self.assertLess(sparse.totalFood, dense.totalFood)
+        self.assertEqual((len(sparse.capsules), len(dense.capsules)), (0, 6))
+
+    def testGamesStart(self):
+        state = GameState()
+        state.initialize(layoutGenerator.generateLayout(41, 41, numGhosts=4, seed=5), 4)
+        self.assertEqual(state.getNumAgents(), 5)
+        self.assertFalse(state.isWin() or state.isLose())
+        self.assertTrue(state.getLegalActions(0))
+
+    def testTooSmall(self):
+        self.assertRaises(Exception, layoutGenerator.generateLayoutText, 4, 9)
+        self.assertRaises(Exception, layoutGenerator.generateLayoutText, 5, 5, numGhosts=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,331 @@
+# test_multiAgents.py
+# -------------------
+# The optional speedups of the search agents must not change their choices.
+
+import random
+import time
+import unittest
+
+import ghostAgents
+import multiAgents
+from multiAgents import EXACT, LOWERBOUND, UPPERBOUND, TranspositionTable
+from tests.test_gameState import randomGames
+
+INF = float('inf')
+
+
+def searchStates(numStates=40, seed=3):
+    """
+    A fixed sample of non-terminal states from seeded random games, with
+    Pacman to move.
+    """
+    states = []
+    for state, agentIndex, action in randomGames(numGames=2, seed=seed):
+        if agentIndex == 0:
+            states.append(state)
+    return states[::max(len(states) // numStates, 1)][:numStates]
+
+
+class TranspositionTableTest(unittest.TestCase):
+
+    def testLookupAndEviction(self):
+        table = TranspositionTable(capacity=2)
+        table.store('a', 2, 0, 1.0, EXACT, 'North')
+        table.store('b', 2, 0, 2.0, LOWERBOUND, 'South')
+        self.assertEqual(table.lookup('a', 2, 0), (1.0, EXACT, 'North')) #now most recently used
+        self.assertEqual(table.lookup('a', 3, 0), None)
+        table.store('c', 2, 0, 3.0, UPPERBOUND, 'East')
+        self.assertEqual(table.lookup('b', 2, 0), None)
+        self.assertEqual(table.lookup('c', 2, 0), (3.0, UPPERBOUND, 'East'))
+        self.assertEqual((table.hits, table.misses, table.evictions), (2, 2, 1))
+        self.assertEqual(table.bestAction('c', 3, 0), 'East') #from one ply shallower
+
+    def testVariantsAreKeptApart(self):
+        table = TranspositionTable()
+        frozen = (frozenset([2]), frozenset())
+        table.store('a', 2, 0, 1.0, EXACT, 'North', frozen)
+        self.assertEqual(table.lookup('a', 2, 0), None)
+        self.assertEqual(table.lookup('a', 2, 0, (frozenset(), frozenset([2]))), None)
+        self.assertEqual(table.lookup('a', 2, 0, frozen), (1.0, EXACT, 'North'))
+        self.assertEqual(table.bestAction('a', 2, 0), 'North')
+
+    def testBoundsOnlyAnswerOutsideTheWindow(self):
+        agent = multiAgents.AlphaBetaAgent(depth='2', transposition='True')
+        agent.record('lower', 1, 0, 5.0, LOWERBOUND, 'North')
+        agent.record('upper', 1, 0, 1.0, UPPERBOUND, 'South')
+        agent.record('exact', 1, 0, 3.0, EXACT, 'East')
+        self.assertEqual(agent.cached_value('lower', 1, 0, (0.0, 4.0)), (5.0, 'North'))
+        self.assertEqual(agent.cached_value('lower', 1, 0, (0.0, 10.0)), None)
+        self.assertEqual(agent.cached_value('upper', 1, 0, (2.0, 10.0)), (1.0, 'South'))
+        self.assertEqual(agent.cached_value('upper', 1, 0, (0.0, 10.0)), None)
+        self.assertEqual(agent.cached_value('exact', 1, 0, (5.0, 10.0)), (3.0, 'East'))
+
+
+class SameChoicesTest(unittest.TestCase):
+    """
+    Each agent keeps its options for the whole sequence of states, so its
+    transposition table carries results from one search to the next, and
+    must agree with a plain agent on every root value and action.
+    """
+
+    def assertSameSearch(self, agentClass, options, depth=3, common={}):
+        plain = agentClass(depth=str(depth), **common)
+        tuned = agentClass(depth=str(depth), **dict(common, **options))
+        states = searchStates()
+        tuned.registerInitialState(states[0])
+        for state in states:
+            for agent in (plain, tuned):
+                agent.classifyGhosts(state)
+            if agentClass is multiAgents.AlphaBetaAgent:
+                expected = plain.max_value(state, 1, 0, (-INF, INF))
+                found = tuned.max_value(state, 1, 0, (-INF, INF))
+            else:
+                expected = plain.max_value(state, 1, 0)
+                found = tuned.max_value(state, 1, 0)
+            self.assertEqual(found, expected)
+
+    def testMinimaxTransposition(self):
+        self.assertSameSearch(multiAgents.MinimaxAgent, {'transposition': 'True'}, depth=2)
+
+    def testAlphaBetaTransposition(self):
+        self.assertSameSearch(multiAgents.AlphaBetaAgent, {'transposition': 'True'})
+
+    def testExpectimaxTransposition(self):
+        self.assertSameSearch(multiAgents.ExpectimaxAgent, {'transposition': 'True'}, depth=2)
+
+    def testFrozenValuesAreNotReused(self):
+        agent = multiAgents.AlphaBetaAgent(depth='2', transposition='True', irrelevantGhosts='freeze')
+        agent.registerInitialState(searchStates()[0])
+        differing = 0
+        for state in searchStates():
+            agent.frozenGhosts = frozenset(range(1, state.getNumAgents()))
+            frozen = agent.max_value(state, 1, 0, (-INF, INF))
+            agent.frozenGhosts = frozenset()
+            full = agent.max_value(state, 1, 0, (-INF, INF))
+            self.assertEqual(full, multiAgents.AlphaBetaAgent(depth='2').max_value(state, 1, 0, (-INF, INF)))
+            differing += frozen != full
+        self.assertGreater(differing, 0) #or the test proves nothing
+
+    def testTranspositionWithIrrelevantGhosts(self):
+        for mode in ('freeze', 'advance'):
+            relevance = {'irrelevantGhosts': mode, 'relevanceRadius': '4'}
+            self.assertSameSearch(multiAgents.AlphaBetaAgent, {'transposition': 'True'}, common=relevance)
+            self.assertSameSearch(multiAgents.ExpectimaxAgent, {'transposition': 'True'}, depth=2,
+                                  common=relevance)
+
+    def testInPlaceSearch(self):
+        self.assertSameSearch(multiAgents.AlphaBetaAgent, {'inPlace': 'True'})
+        self.assertSameSearch(multiAgents.ExpectimaxAgent, {'inPlace': 'True'}, depth=2)
+
+    def testStarPruning(self):
+        plain = multiAgents.ExpectimaxAgent(depth='2')
+        for star in ('1', '2'):
+            pruned = multiAgents.ExpectimaxAgent(depth='2', star=star)
+            for state in searchStates():
+                self.assertEqual(pruned.star_max(state, 1, 0, (-INF, INF)), plain.max_value(state, 1, 0))
+            self.assertGreater(pruned.starCutoffs, 0) #or the test proves nothing
+
+    def testParallelRootSearch(self):
+        states = searchStates(numStates=10)
+        for agentClass in (multiAgents.AlphaBetaAgent, multiAgents.ExpectimaxAgent):
+            serial = agentClass(depth='2', workers='1')
+            parallel = agentClass(depth='2', workers='2')
+            for agent in (serial, parallel):
+                agent.registerInitialState(states[0])
+            try:
+                for state in states:
+                    self.assertEqual(parallel.getAction(state), serial.getAction(state))
+                self.assertIsNotNone(parallel.pool) #the choices came from the workers
+            finally:
+                parallel.final(states[0])
+
+
+def bestActions(state, depth):
+    """
+    The root actions of equal best value for a plain depth-limited alpha-beta
+    search; iterative deepening may break ties between them differently.
+    """
+    agent = multiAgents.AlphaBetaAgent(depth=str(depth))
+    values = dict((action, agent.value(state.generateSuccessor(0, action), 1, 0, (-INF, INF))[0])
+                  for action in state.getLegalActions(0))
+    return [action for action in values if values[action] == max(values.values())]
+
+
+class InterruptedAgent(multiAgents.AlphaBetaAgent):
+    """
+    Runs out of time partway through the depth-3 iteration.
+    """
+
+    def checkTime(self):
+        multiAgents.AlphaBetaAgent.checkTime(self)
+        if self.depth == 3 and self.nodes - self.iterationNodes > 20:
+            raise multiAgents.SearchTimeout()
+
+    def searchRoot(self, gameState, rootSearch):
+        self.iterationNodes = self.nodes
+        return multiAgents.AlphaBetaAgent.searchRoot(self, gameState, rootSearch)
+
+
+class IterativeDeepeningTest(unittest.TestCase):
+
+    def testFirstPlyAlwaysCompletes(self):
+        for state in searchStates(numStates=10):
+            agent = multiAgents.AlphaBetaAgent(depth='auto', timeLimit='0')
+            self.assertIn(agent.getAction(state), bestActions(state, 1))
+            self.assertEqual(agent.completedDepth, 1)
+
+    def testTimeoutFallsBackToTheLastCompletedDepth(self):
+        for inPlace in ('False', 'True'):
+            agent = InterruptedAgent(depth='auto', timeLimit='60', inPlace=inPlace)
+            for state in searchStates(numStates=10):
+                before = state.deepCopy()
+                self.assertIn(agent.getAction(state), bestActions(state, 2))
+                self.assertEqual(agent.completedDepth, 2)
+                self.assertEqual(state, before) #an interrupted in-place search works on a copy
+                self.assertEqual(hash(state), hash(before))
+
+
+class MoveOrderingTest(unittest.TestCase):
+
+    def testSameValuesAndBestActions(self):
+        for options in ({}, {'transposition': 'True'}):
+            plain = multiAgents.AlphaBetaAgent(depth='3')
+            ordered = multiAgents.AlphaBetaAgent(depth='3', ordering='MoveOrdering', **options)
+            for state in searchStates(numStates=20):
+                ordered.moveOrdering.newSearch()
+                value, action = ordered.max_value(state, 1, 0, (-INF, INF))
+                self.assertEqual(value, plain.max_value(state, 1, 0, (-INF, INF))[0])
+                self.assertIn(action, bestActions(state, 3)) #ties may be broken in the new order
+            self.assertLess(ordered.nodes, plain.nodes)
+            self.assertGreater(ordered.moveOrdering.firstChildCutoffRate(), 0.5)
+
+
+def weightedValue(state, depth, agentIndex):
+    """
+    Expectimax with each ghost moving as DirectionalGhost's distribution
+    says, written out directly, for `depth` more moves of Pacman's.  The
+    leaves are scored by betterEvaluationFunction, which ghost distances
+    affect.
+    """
+    if state.isWin() or state.isLose() or (agentIndex == 0 and depth == 0):
+        return multiAgents.betterEvaluationFunction(state)
+    nextAgent = (agentIndex + 1) % state.getNumAgents()
+    nextDepth = depth - 1 if agentIndex == 0 else depth
+    actions = state.getLegalActions(agentIndex)
+    if agentIndex == 0:
+        return max(weightedValue(state.generateSuccessor(0, action), nextDepth, nextAgent) for action in actions)
+    distribution = ghostAgents.DirectionalGhost(agentIndex).getDistribution(state)
+    total = float(sum(distribution[action] for action in actions))
+    return sum(distribution[action] / total * weightedValue(state.generateSuccessor(agentIndex, action),
+                                                            nextDepth, nextAgent)
+               for action in actions if distribution[action] > 0)
+
+
+class GhostModelTest(unittest.TestCase):
+
+    def testDistributions(self):
+        model = multiAgents.GhostModel()
+        likely = multiAgents.GhostModel(threshold=0.2)
+        for state in searchStates(numStates=20):
+            for ghostIndex in range(1, state.getNumAgents()):
+                legal = state.getLegalActions(ghostIndex)
+                distribution = model.getDistribution(state, ghostIndex)
+                self.assertEqual([action for action, _ in distribution],
+                                 [action for action in legal if action in dict(distribution)])
+                self.assertAlmostEqual(sum(p for _, p in distribution), 1.0)
+                self.assertAlmostEqual(sum(p for _, p in likely.getDistribution(state, ghostIndex)), 1.0)
+                self.assertIs(model.getDistribution(state, ghostIndex), distribution) #memoized
+        self.assertGreater(likely.pruned, 0)
+
+    def testWeightedChanceNodes(self):
+        weighted = multiAgents.ExpectimaxAgent(depth='2', evalFn='better', ghostModel='DirectionalGhost')
+        uniform = multiAgents.ExpectimaxAgent(depth='2', evalFn='better', ghostModel='ghostAgents.RandomGhost')
+        plain = multiAgents.ExpectimaxAgent(depth='2', evalFn='better')
+        differing = 0
+        for state in searchStates(numStates=20):
+            value = weighted.max_value(state, 1, 0)[0]
+            self.assertAlmostEqual(value, weightedValue(state, 2, 0))
+            self.assertEqual(uniform.max_value(state, 1, 0), plain.max_value(state, 1, 0))
+            differing += abs(value - plain.max_value(state, 1, 0)[0]) > 1e-9
+        self.assertGreater(differing, 0) #or the weights made no difference
+
+
+class PonderTest(unittest.TestCase):
+
+    def testPonderedMovesMatchFreshSearches(self):
+        for agentClass in (multiAgents.MinimaxAgent, multiAgents.ExpectimaxAgent):
+            rand = random.Random(0)
+            plain = agentClass(depth='2')
+            agent = agentClass(depth='2', ponder='True')
+            state = searchStates(numStates=1)[0]
+            agent.registerInitialState(state)
+            for move in range(8):
+                action = agent.getAction(state)
+                self.assertEqual(action, plain.getAction(state))
+                self.assertEqual(agent.seeded, move > 0) #every reply was pondered before this move
+                agent.ponderThread.join()
+                self.assertEqual(agent.depth, 2) #the ponderer searched with its own depth
+                replies = [reply for reply in agent.ghostReplies(state.generateSuccessor(0, action), 1)
+                           if not (reply.isWin() or reply.isLose())]
+                self.assertEqual(agent.pondered, len(replies))
+                if not replies:
+                    break
+                state = rand.choice(replies)
+            agent.final(state)
+
+
+class MCTSTest(unittest.TestCase):
+
+    def testLegalMovesWithinTheBudget(self):
+        random.seed(0)
+        agent = multiAgents.MCTSAgent(budget='50')
+        states = searchStates(numStates=10)
+        agent.registerInitialState(states[0])
+        for state in states:
+            self.assertIn(agent.getAction(state), state.getLegalActions(0))
+            self.assertEqual(agent.simulations, 50)
+
+    def testLegalMovesWithinTheTimeLimit(self):
+        random.seed(0)
+        agent = multiAgents.MCTSAgent(budget='0', timeLimit='0.05')
+        for state in searchStates(numStates=5):
+            start = time.time()
+            self.assertIn(agent.getAction(state), state.getLegalActions(0))
+            self.assertLess(time.time() - start, 0.5)
+            self.assertGreater(agent.simulations, 0)
+
+    def testSubtreeReuse(self):
+        random.seed(0)
+        agent = multiAgents.MCTSAgent(budget='100')
+        state = searchStates(numStates=1)[0]
+        agent.registerInitialState(state)
+        action = agent.getAction(state)
+        children = agent.root.children[action]
+        reached = max(children, key=lambda child: children[child].visits) #a ghost reply the tree sampled
+        visits = children[reached].visits
+        self.assertIn(agent.getAction(reached), reached.getLegalActions(0))
+        self.assertEqual(agent.reusedVisits, visits)
+        self.assertEqual(agent.root.visits, visits + 100)
+
+
+class FeatureCacheTest(unittest.TestCase):
+
+    def testCachedFeaturesMatchUncached(self):
+        for cache in multiAgents.FEATURE_CACHES:
+            cache.clear()
+        for state, agentIndex, action in randomGames(numGames=2, seed=5):
+            for successor in (state, state.generateSuccessor(agentIndex, action)): #the second probe may hit
+                self.assertEqual(multiAgents.foodDistance(successor), multiAgents.sumOfFoodDistances(successor))
+                self.assertEqual(multiAgents.ghostDistances(successor),
+                                 multiAgents.ghostManhattanDistances(successor))
+                food = multiAgents.sumOfFoodDistances(successor)
+                expected = successor.getScore() * (sum([x / (food ** 2) for x in
+                                                        multiAgents.ghostManhattanDistances(successor)]) + 1e-1)
+                self.assertEqual(multiAgents.betterEvaluationFunction(successor), expected)
+        stats = multiAgents.featureCacheStats()
+        self.assertGreater(stats['foodDistance'][0], 0)
+        self.assertGreater(stats['ghostDistances'][0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()